@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+The ranking event stream (/api/tasks/tenants/<tenant>/stream/) holds
+connections open, so serve it from this application, e.g.:
+
+    uvicorn task_analyzer.asgi:application
 """
 
 import os
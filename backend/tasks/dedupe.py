@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import random
+import re
+from array import array
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+
+# ---------- Configuration ----------
+
+DEDUPE_MODES = ("flag", "merge")
+
+# Minimum Jaccard similarity of title trigram sets to call two tasks duplicates.
+DEFAULT_THRESHOLD = 0.8
+
+# MinHash LSH banding: each band hashes a title's trigrams with its own
+# hash function and keys the title by the ROWS smallest values. Two titles
+# with Jaccard similarity J share a band with probability of roughly J^ROWS,
+# so they become candidates with probability about 1 - (1 - J^ROWS)^BANDS:
+# above 99% at J = 0.8, and under 30% at J = 0.5.
+BANDS = 20
+ROWS = 6
+
+# Buckets with more members are split by keying them on two more of the
+# band's smallest values, repeatedly. Such buckets come from titles that
+# share a template ("Fix login bug for ..."); true duplicates inside them
+# almost always also meet in small buckets of other bands.
+MAX_BUCKET_SIZE = 64
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+_PRIME = (1 << 61) - 1
+# Fixed seed so the same titles always produce the same candidates.
+_HASH_SEED = 0x5EED
+
+
+# ---------- Helpers ----------
+
+def normalize_title(title: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_NON_WORD.sub(" ", title.lower()).split())
+
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    padded = f" {text} "
+    if len(padded) < 3:
+        return frozenset([padded])
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Keep the smaller index as root so the earliest task wins.
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+# ---------- Core detection ----------
+
+def _verify(members: List[int], shingles: List[array], rep_index: List[int],
+            uf: _UnionFind, threshold: float):
+    """Union every pair of ``members`` whose trigram Jaccard reaches the
+    threshold, tested exactly as |A & B| * (1 + t) >= t * (|A| + |B|)."""
+    sets = [frozenset(shingles[r]) for r in members]
+    sizes = [len(s) for s in sets]
+    for i in range(len(members) - 1):
+        s, size = sets[i], sizes[i]
+        hits = [
+            j for j in range(i + 1, len(members))
+            if len(s & sets[j]) * (1 + threshold) >= threshold * (size + sizes[j])
+        ]
+        for j in hits:
+            uf.union(rep_index[members[i]], rep_index[members[j]])
+
+
+def _band_hashes(bands: int) -> List[Tuple[int, int]]:
+    rng = random.Random(_HASH_SEED)
+    return [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(bands)]
+
+
+def find_duplicates(
+    titles: Sequence[str],
+    threshold: float = DEFAULT_THRESHOLD,
+    bands: int = BANDS,
+    rows: int = ROWS,
+) -> List[List[int]]:
+    """
+    Group near-duplicate titles with MinHash LSH.
+
+    1. Titles that are identical after normalization are grouped with a
+       dict lookup and only one representative goes further.
+    2. Each representative gets one key per band: the ``rows`` smallest
+       values of that band's hash over its trigrams. Unlike blocking on
+       rare words, this needs no frequency cut-off, so titles made only
+       of common words are still matched.
+    3. Titles sharing a band key are verified with the exact Jaccard
+       similarity of their trigram sets and joined with union-find, so a
+       reported pair is never below the threshold. A pair at or above it
+       is only missed if it shares no band (see BANDS/ROWS).
+
+    Returns groups of input indices (each sorted, size >= 2), ordered by
+    their first index. The first index of a group is its canonical task.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1].")
+
+    # 1) Exact duplicates after normalization
+    rep_of: Dict[str, int] = {}
+    rep_index: List[int] = []
+    uf = _UnionFind(len(titles))
+    for idx, title in enumerate(titles):
+        norm = normalize_title(title)
+        r = rep_of.get(norm)
+        if r is None:
+            r = rep_of[norm] = len(rep_index)
+            rep_index.append(idx)
+        else:
+            uf.union(rep_index[r], idx)
+
+    # 2) Band keys. Trigrams are interned to ids whose per-band hashes are
+    # computed once; each title keeps only a compact array of its ids.
+    coeffs = _band_hashes(bands)
+    trigram_ids: Dict[str, int] = {}
+    trigram_hashes: List[Tuple[int, ...]] = []
+    shingles: List[array] = []
+    band_keys = [array("q") for _ in range(bands)]
+    for norm in rep_of:
+        ids = array("I")
+        for gram in _trigrams(norm):
+            gid = trigram_ids.get(gram)
+            if gid is None:
+                gid = trigram_ids[gram] = len(trigram_hashes)
+                x = int.from_bytes(gram.encode("utf-8"), "little")
+                # Top 30 bits: single-digit ints compare fastest when sorting.
+                trigram_hashes.append(tuple([((a * x + b) % _PRIME) >> 31 for a, b in coeffs]))
+            ids.append(gid)
+        shingles.append(ids)
+        columns = zip(*[trigram_hashes[gid] for gid in ids])
+        for keys, column in zip(band_keys, columns):
+            keys.append(hash(tuple(sorted(column)[:rows])))
+    del rep_of, trigram_ids
+
+    # 3) Verify candidates band by band
+    def split(members: List[int], band: int, depth: int) -> List[List[int]]:
+        if len(members) <= MAX_BUCKET_SIZE:
+            return [members]
+        depth += 2
+        buckets: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+        for r in members:
+            column = sorted(trigram_hashes[gid][band] for gid in shingles[r])
+            buckets[tuple(column[:depth])].append(r)
+        if len(buckets) == 1 and depth >= max(len(shingles[r]) for r in members):
+            # Identical trigram sets; nothing left to split on.
+            return [members]
+        return [part for sub in buckets.values() if len(sub) > 1
+                for part in split(sub, band, depth)]
+
+    for band, keys in enumerate(band_keys):
+        buckets: Dict[int, List[int]] = defaultdict(list)
+        for r, key in enumerate(keys):
+            buckets[key].append(r)
+        for bucket in buckets.values():
+            if len(bucket) < 2:
+                continue
+            for members in split(bucket, band, rows):
+                _verify(members, shingles, rep_index, uf, threshold)
+        del buckets
+
+    # 4) Collect groups
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for idx in range(len(titles)):
+        groups[uf.find(idx)].append(idx)
+    return sorted(
+        (members for members in groups.values() if len(members) > 1),
+        key=lambda members: members[0],
+    )
+
+
+def duplicate_pairs_naive(titles: Sequence[str], threshold: float = DEFAULT_THRESHOLD) -> List[Tuple[int, int]]:
+    """O(n²) reference implementation, used by tests and the benchmark."""
+    shingles = [_trigrams(normalize_title(t)) for t in titles]
+    pairs = []
+    for i in range(len(shingles)):
+        for j in range(i + 1, len(shingles)):
+            a, b = shingles[i], shingles[j]
+            inter = len(a & b)
+            if inter / (len(a) + len(b) - inter) >= threshold:
+                pairs.append((i, j))
+    return pairs
@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+from array import array
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+try:  # POSIX only; elsewhere writers are serialized within a process only.
+    import fcntl
+except ImportError:  # pragma: no cover - depends on the platform
+    fcntl = None
+
+
+# ---------- Format ----------
+#
+# A task graph file holds one scored ranking, rows in rank order:
+#
+#   header   magic, format version, row count, section table
+#   columns  fixed-width native-endian arrays, one value per row
+#   strings  one table (u32 offsets + UTF-8 blob) for ids, titles,
+#            unknown dependency ids and reasons; ids are entries 0..n-1
+#   CSR      dependency and reason lists as indptr/indices arrays
+#   id_order rows sorted by id, for binary-search lookups
+#   meta     small JSON object (strategy, scored_on, version)
+#
+# Every section starts on an 8-byte boundary so readers can cast the
+# mapped bytes directly to typed memoryviews without copying.
+
+MAGIC = b"TASKGRPH"
+FORMAT_VERSION = 1
+
+# (name, typecode); typecode None marks raw bytes
+SECTIONS: Tuple[Tuple[str, Optional[str]], ...] = (
+    ("score", "d"),
+    ("urgency_score", "d"),
+    ("importance_score", "d"),
+    ("effort_score", "d"),
+    ("dependency_score", "d"),
+    ("estimated_hours", "d"),
+    ("importance", "i"),
+    ("due_date", "i"),
+    ("priority_label", "B"),
+    ("str_offsets", "I"),
+    ("str_blob", None),
+    ("dep_indptr", "I"),
+    ("dep_indices", "I"),
+    ("reason_indptr", "I"),
+    ("reason_indices", "I"),
+    ("id_order", "I"),
+    ("meta", None),
+)
+
+_HEADER = struct.Struct("<8sII")
+_SECTION = struct.Struct("<QQ")
+_HEADER_SIZE = _HEADER.size + _SECTION.size * len(SECTIONS)
+
+LABELS = ("Low", "Medium", "High")
+
+GRAPH_DIR = getattr(settings, "TASKS_GRAPH_DIR", None)
+
+_TENANT_NAME = re.compile(r"[-a-zA-Z0-9_]+")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+# ---------- Writer ----------
+
+class _StringTable:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.offsets = array("I", [0])
+        self.blob = bytearray()
+
+    def add(self, value: str, intern: bool = True) -> int:
+        if intern and value in self.index:
+            return self.index[value]
+        idx = len(self.offsets) - 1
+        self.blob += value.encode("utf-8")
+        self.offsets.append(len(self.blob))
+        if intern:
+            self.index[value] = idx
+        return idx
+
+
+def write_task_graph(path: str, ranking: List[dict], meta: Optional[dict] = None
+                     ) -> Tuple[int, int, int]:
+    """
+    Write a sorted ``analyze_tasks`` result to ``path`` and return its
+    stamp (as in ``TaskGraph.stamp``).
+    The file is written next to its destination and renamed into place,
+    so readers never map a half-written snapshot.
+    """
+    n = len(ranking)
+    columns = {name: array(code) for name, code in SECTIONS[:9]}
+    strings = _StringTable()
+
+    # Ids first so that string index == row index for every task.
+    row_of: Dict[str, int] = {}
+    for i, t in enumerate(ranking):
+        strings.add(t["id"], intern=False)
+        row_of[t["id"]] = i
+    for t in ranking:
+        strings.add(t["title"], intern=False)
+
+    dep_indptr, dep_indices = array("I", [0]), array("I")
+    reason_indptr, reason_indices = array("I", [0]), array("I")
+
+    for t in ranking:
+        for name in ("score", "urgency_score", "importance_score", "effort_score",
+                     "dependency_score"):
+            columns[name].append(t[name])
+        hours = t["estimated_hours"]
+        columns["estimated_hours"].append(math.nan if hours is None else hours)
+        columns["importance"].append(-1 if t["importance"] is None else t["importance"])
+        due = t["due_date"]
+        columns["due_date"].append(date.fromisoformat(due).toordinal() if due else 0)
+        columns["priority_label"].append(LABELS.index(t["priority_label"]))
+
+        for dep in t["dependencies"]:
+            row = row_of.get(dep)
+            dep_indices.append(row if row is not None else strings.add(dep))
+        dep_indptr.append(len(dep_indices))
+        for reason in t["reasons"]:
+            reason_indices.append(strings.add(reason))
+        reason_indptr.append(len(reason_indices))
+
+    ids = [t["id"].encode("utf-8") for t in ranking]
+    id_order = array("I", sorted(range(n), key=ids.__getitem__))
+
+    payloads = dict(columns)
+    payloads.update(
+        str_offsets=strings.offsets,
+        str_blob=bytes(strings.blob),
+        dep_indptr=dep_indptr,
+        dep_indices=dep_indices,
+        reason_indptr=reason_indptr,
+        reason_indices=reason_indices,
+        id_order=id_order,
+        meta=json.dumps(meta or {}).encode("utf-8"),
+    )
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        # Other worker processes only need to read the snapshot.
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, "wb") as fh:
+            table = []
+            offset = _align(_HEADER_SIZE)
+            blobs = []
+            for name, _ in SECTIONS:
+                data = payloads[name]
+                raw = data.tobytes() if isinstance(data, array) else data
+                table.append((offset, len(raw)))
+                blobs.append((offset, raw))
+                offset = _align(offset + len(raw))
+
+            fh.write(_HEADER.pack(MAGIC, FORMAT_VERSION, n))
+            for entry in table:
+                fh.write(_SECTION.pack(*entry))
+            for start, raw in blobs:
+                fh.write(b"\0" * (start - fh.tell()))
+                fh.write(raw)
+        # Renaming keeps inode, mtime and size, so this is the stamp
+        # readers will see even if another process replaces it later.
+        stat = os.stat(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+# ---------- Reader ----------
+
+class TaskGraph:
+    """
+    Read-only, memory-mapped view of a task graph file.
+
+    Numeric columns are exposed as typed memoryviews over the mapping
+    (``graph.column("score")``), so every worker process that opens the
+    same file shares its pages through the OS page cache instead of
+    holding its own copy. Only the rows actually requested are decoded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as fh:
+            stat = os.fstat(fh.fileno())
+            self.stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a task graph file (version {FORMAT_VERSION}).")
+        self._n = n
+
+        buf = memoryview(self._mmap)
+        self._views: Dict[str, memoryview] = {}
+        for i, (name, code) in enumerate(SECTIONS):
+            start, length = _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size)
+            view = buf[start:start + length]
+            self._views[name] = view.cast(code) if code else view
+        self.meta: dict = json.loads(bytes(self._views["meta"]).decode("utf-8"))
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> dict:
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        return self.row(i)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(self._n))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+
+    def column(self, name: str) -> memoryview:
+        """Zero-copy view of a numeric column, indexed by rank."""
+        return self._views[name]
+
+    def dependency_count(self) -> int:
+        """Number of dependency edges over all rows."""
+        return self._views["dep_indptr"][-1]
+
+    def _string(self, idx: int) -> str:
+        offsets = self._views["str_offsets"]
+        return bytes(self._views["str_blob"][offsets[idx]:offsets[idx + 1]]).decode("utf-8")
+
+    def _csr(self, name: str, row: int) -> memoryview:
+        indptr = self._views[f"{name}_indptr"]
+        return self._views[f"{name}_indices"][indptr[row]:indptr[row + 1]]
+
+    def ids(self) -> List[str]:
+        """Task ids in rank order, without decoding the rest of each row."""
+        return [self._string(i) for i in range(self._n)]
+
+    def labels(self) -> List[str]:
+        return [LABELS[code] for code in self._views["priority_label"]]
+
+    def find(self, task_id: str) -> Optional[int]:
+        """Rank of ``task_id`` via binary search over the id index."""
+        target = task_id.encode("utf-8")
+        order = self._views["id_order"]
+        offsets = self._views["str_offsets"]
+        blob = self._views["str_blob"]
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            row = order[mid]
+            current = blob[offsets[row]:offsets[row + 1]].tobytes()
+            if current < target:
+                lo = mid + 1
+            elif current > target:
+                hi = mid
+            else:
+                return row
+        return None
+
+    def row(self, i: int) -> dict:
+        """Decode one row into the ``analyze_tasks`` output shape."""
+        v = self._views
+        hours = v["estimated_hours"][i]
+        importance = v["importance"][i]
+        due = v["due_date"][i]
+        return {
+            "id": self._string(i),
+            "title": self._string(self._n + i),
+            "due_date": date.fromordinal(due).isoformat() if due else None,
+            "estimated_hours": None if math.isnan(hours) else hours,
+            "importance": None if importance < 0 else importance,
+            "dependencies": [self._string(d) for d in self._csr("dep", i)],
+            "urgency_score": v["urgency_score"][i],
+            "importance_score": v["importance_score"][i],
+            "effort_score": v["effort_score"][i],
+            "dependency_score": v["dependency_score"][i],
+            "score": v["score"][i],
+            "priority_label": LABELS[v["priority_label"][i]],
+            "reasons": [self._string(r) for r in self._csr("reason", i)],
+        }
+
+    def top(self, k: int) -> List[dict]:
+        return self.rows(0, k)
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """Decode rows ``start:stop`` (all of them by default)."""
+        stop = self._n if stop is None else min(stop, self._n)
+        return [self.row(i) for i in range(max(0, start), stop)]
+
+
+# ---------- Per-process cache ----------
+
+_open_graphs: Dict[str, TaskGraph] = {}
+_open_lock = threading.Lock()
+
+
+def graph_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identity of the file currently at ``path``; None if there is none."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def open_task_graph(path: str) -> Optional[TaskGraph]:
+    """
+    Return a cached mapping of ``path``, remapping it when the file has
+    been replaced. Returns None when no snapshot has been written yet.
+    """
+    stamp = graph_stamp(path)
+    if stamp is None:
+        return None
+    with _open_lock:
+        graph = _open_graphs.get(path)
+        if graph is None or graph.stamp != stamp:
+            # The previous mapping is left to the garbage collector, since
+            # other threads may still be decoding rows from it.
+            graph = _open_graphs[path] = TaskGraph(path)
+        return graph
+
+
+@contextmanager
+def graph_write_lock(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on ``path`` across worker processes (an
+    ``flock`` on ``<path>.lock``), so read-modify-write cycles on the
+    same graph file never interleave.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock.
+        os.close(fd)
+
+
+def tenant_graph_path(tenant: str) -> Optional[str]:
+    """Snapshot path for ``tenant``, or None when TASKS_GRAPH_DIR is unset."""
+    if not GRAPH_DIR:
+        return None
+    if not _TENANT_NAME.fullmatch(tenant):
+        raise ValueError("Tenant names may only contain letters, digits, '_' and '-'.")
+    return os.path.join(GRAPH_DIR, f"{tenant}.tgraph")
+
+
+def load_tenant_graph(tenant: str) -> Optional[TaskGraph]:
+    path = tenant_graph_path(tenant)
+    return open_task_graph(path) if path else None
@@ -0,0 +1,635 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import (
+    AsyncIterator, Callable, ContextManager, Deque, Dict, Iterator, List, Optional, Sequence,
+    Tuple,
+)
+
+from django.conf import settings
+
+from .graphfile import (
+    TaskGraph, graph_stamp, graph_write_lock, open_task_graph, tenant_graph_path,
+    write_task_graph,
+)
+from .queries import RankingIndex, RankingQuery
+from .scheduling import estimate_cost
+from .scoring import analyze_tasks, _parse_date, DEFAULT_STRATEGY
+
+
+# ---------- Configuration ----------
+
+# Diffs kept per tenant so reconnecting subscribers can catch up, bounded
+# by count and by total encoded size (the newest diff is always kept).
+HISTORY_SIZE = getattr(settings, "TASKS_LIVE_HISTORY_SIZE", 64)
+HISTORY_BYTES = getattr(settings, "TASKS_LIVE_HISTORY_BYTES", 256 * 1024)
+# Seconds between keep-alive comments on an idle stream.
+HEARTBEAT_SECONDS = getattr(settings, "TASKS_LIVE_HEARTBEAT", 25)
+# Seconds between checks for rankings written by other worker processes
+# (with TASKS_GRAPH_DIR); one check per tenant with subscribers.
+POLL_SECONDS = getattr(settings, "TASKS_LIVE_POLL", 1)
+
+# Day offsets (due_date - today) at which the urgency bucket changes,
+# mirroring the thresholds in analyze_tasks.
+_URGENCY_BOUNDARIES = (30, 14, 7, 3, 0, -1)
+
+# Input fields of a task, recovered from graph rows when it has to be rescored.
+_TASK_FIELDS = ("id", "title", "due_date", "estimated_hours", "importance", "dependencies")
+
+
+# ---------- Diffing ----------
+
+def diff_rankings(old: Sequence[dict], new: Sequence[dict]) -> dict:
+    """
+    Compare two sorted rankings and describe what changed.
+    Only keys with changes are included; an empty dict means no change.
+
+    ``moved`` only lists tasks whose order relative to the others
+    changed. The rest, a longest run of tasks that kept their relative
+    order, shift implicitly, so one task added at the top of a large
+    ranking is a single ``added`` entry. To apply a diff, drop the
+    ``removed`` and ``moved`` ids from the old order, then insert the
+    ``moved`` and ``added`` tasks at their new rank (``to`` / ``rank``),
+    lowest rank first.
+    """
+    old_ids, old_labels = _ids_and_labels(old)
+    new_ids, new_labels = _ids_and_labels(new)
+    old_pos = {tid: i for i, tid in enumerate(old_ids)}
+    new_present = set(new_ids)
+
+    kept = [i for i, tid in enumerate(new_ids) if tid in old_pos]
+    stationary = _longest_increasing(kept, [old_pos[new_ids[i]] for i in kept])
+
+    diff: dict = {}
+    moved, labels, added = [], [], []
+    for i, tid in enumerate(new_ids):
+        prev_rank = old_pos.get(tid)
+        if prev_rank is None:
+            added.append({"id": tid, "rank": i + 1, "priority_label": new_labels[i]})
+            continue
+        if i not in stationary:
+            moved.append({"id": tid, "from": prev_rank + 1, "to": i + 1})
+        if old_labels[prev_rank] != new_labels[i]:
+            labels.append({"id": tid, "from": old_labels[prev_rank], "to": new_labels[i]})
+    removed = [tid for tid in old_pos if tid not in new_present]
+
+    if moved:
+        diff["moved"] = moved
+    if labels:
+        diff["labels"] = labels
+    if added:
+        diff["added"] = added
+    if removed:
+        diff["removed"] = removed
+
+    if new_ids[:3] != old_ids[:3]:
+        diff["top3"] = new_ids[:3]
+    return diff
+
+
+def _longest_increasing(keys: List[int], values: List[int]) -> set:
+    """
+    ``keys`` of a longest strictly increasing subsequence of ``values``
+    (patience sorting, O(n log n)).
+    """
+    tails: List[int] = []       # smallest last value of a run of each length
+    tail_at: List[int] = []     # position in `values` of that last value
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        length = bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_at.append(i)
+        else:
+            tails[length] = value
+            tail_at[length] = i
+        previous[i] = tail_at[length - 1] if length else -1
+
+    result = set()
+    i = tail_at[-1] if tail_at else -1
+    while i >= 0:
+        result.add(keys[i])
+        i = previous[i]
+    return result
+
+
+def _ids_and_labels(ranking: Sequence[dict]) -> Tuple[List[str], List[str]]:
+    # A mapped graph answers from its columns without decoding whole rows.
+    if isinstance(ranking, TaskGraph):
+        return ranking.ids(), ranking.labels()
+    return [t["id"] for t in ranking], [t["priority_label"] for t in ranking]
+
+
+def _due_dates(ranking: Sequence[dict]) -> Iterator[date]:
+    if isinstance(ranking, TaskGraph):
+        return (date.fromordinal(o) for o in ranking.column("due_date") if o)
+    return (due for due in map(_parse_date, (t["due_date"] for t in ranking)) if due)
+
+
+def _input_tasks(ranking: Sequence[dict]) -> List[dict]:
+    return [{name: row[name] for name in _TASK_FIELDS} for row in ranking]
+
+
+def _next_urgency_boundary(ranking: Sequence[dict], today: date) -> Optional[date]:
+    """First date after ``today`` on which any task changes urgency bucket."""
+    boundary: Optional[date] = None
+    for due in _due_dates(ranking):
+        for offset in _URGENCY_BOUNDARIES:
+            candidate = due - timedelta(days=offset)
+            if candidate > today:
+                if boundary is None or candidate < boundary:
+                    boundary = candidate
+                break
+    return boundary
+
+
+# ---------- Per-tenant state ----------
+
+@dataclass
+class TenantIndex:
+    index: RankingIndex = field(default_factory=RankingIndex)
+    # Tenant revision the index reflects; -1 until first built
+    revision: int = -1
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+@dataclass
+class TenantRanking:
+    # Input of the last local update; None once the ranking is a mapped
+    # TaskGraph, from which the tasks are re-read when needed.
+    tasks: Optional[List[dict]] = None
+    strategy: str = DEFAULT_STRATEGY
+    today: Optional[date] = None
+    # Rows in rank order: a list, or the tenant's mapped TaskGraph
+    ranking: Sequence[dict] = field(default_factory=list)
+    next_boundary: Optional[date] = None
+    refreshed_on: Optional[date] = None
+    version: int = 0
+    # Stamp of the graph file this process last wrote or adopted
+    graph_stamp: Optional[Tuple[int, int, int]] = None
+    # Bumped on every rescore, even when the ranking diff is empty
+    revision: int = 0
+    # Query indexes per strategy, see queries.RankingIndex
+    indexes: Dict[str, TenantIndex] = field(default_factory=dict)
+    # (version, previous version, pre-encoded JSON diff) shared by every
+    # subscriber; a diff adopted from a graph file can span several versions
+    history: Deque[Tuple[int, int, str]] = field(default_factory=deque)
+    history_bytes: int = 0
+
+
+class RankingHub:
+    """
+    Keeps each tenant's scored ranking in memory and fans out ranking
+    diffs to SSE subscribers.
+
+    Subscribers hold no queue of their own: they wait on a shared
+    per-tenant event and read pre-encoded diffs from a bounded history,
+    so an idle connection costs little more than its coroutine.
+
+    When TASKS_GRAPH_DIR is set, every rescored ranking is also written
+    as a memory-mappable task graph file shared by all worker processes,
+    and the hub keeps a handle to that mapping instead of decoded rows.
+    One poller task per subscribed tenant and event loop watches that
+    file, so an update handled by one worker also reaches streams served
+    by the others. Writers lock the file across
+    processes and adopt its newest ranking before publishing, so diffs
+    are always taken against the latest ranking and versions (the SSE
+    event ids) count up in step on every worker. Without it, the stream
+    only sees updates made through the same process.
+
+    State is only created by updates (or an adopted graph file); reads
+    for unknown tenants return an empty ranking.
+
+    Each local rescore also updates the tenant's query index for the
+    scored strategy. Indexes for other strategies, and for rankings
+    adopted from another worker's graph file, are brought up to date on
+    their next query.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, TenantRanking] = {}
+        # Serialize each tenant's publishes (and adoption of graph files)
+        self._tenant_locks: Dict[str, threading.Lock] = {}
+        # One wake-up event per tenant and event loop, replaced after each
+        # publish; kept apart from the rankings so that subscribers of a
+        # tenant without state yet are woken by its first update.
+        self._waiters: Dict[str, Dict[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+        # Per (event loop, tenant): subscriber count and graph file poller
+        self._subscribers: Dict[Tuple[asyncio.AbstractEventLoop, str], int] = {}
+        self._pollers: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Task] = {}
+
+    def _state(self, tenant: str) -> TenantRanking:
+        """Get or create a tenant's state; only for writes."""
+        state = self._tenants.get(tenant)
+        if state is None:
+            state = self._tenants[tenant] = TenantRanking()
+        return state
+
+    def _tenant_lock(self, tenant: str) -> threading.Lock:
+        with self._lock:
+            lock = self._tenant_locks.get(tenant)
+            if lock is None:
+                lock = self._tenant_locks[tenant] = threading.Lock()
+            return lock
+
+    @contextmanager
+    def _writing(self, tenant: str) -> Iterator[Optional[str]]:
+        """
+        Hold the tenant's write lock (across processes, with
+        TASKS_GRAPH_DIR) after adopting its newest graph file. Yields the
+        graph file path, or None when rankings are not shared.
+        """
+        path = tenant_graph_path(tenant)
+        with self._tenant_lock(tenant):
+            if path is None:
+                yield None
+                return
+            with graph_write_lock(path):
+                self._adopt(tenant, path)
+                yield path
+
+    # ----- writes (called from sync views / worker threads) -----
+
+    def update(self, tenant: str, tasks: List[dict], strategy: str = DEFAULT_STRATEGY,
+               today: Optional[date] = None) -> dict:
+        """Replace a tenant's tasks, rescore and publish the resulting diff."""
+        today = today or date.today()
+        ranking = analyze_tasks(tasks, strategy_name=strategy, today=today)
+        with self._writing(tenant) as path:
+            with self._lock:
+                state = self._state(tenant)
+            # Only publishes change the ranking, and they all hold the
+            # tenant lock, so the diff can be taken outside the hub lock.
+            diff = diff_rankings(state.ranking, ranking)
+            with self._lock:
+                state.tasks = list(tasks)
+                state.strategy = strategy
+                self._publish(tenant, state, ranking, today, diff)
+                version, revision = state.version, state.revision
+            graph = (self._persist(path, state, ranking, strategy, today, version, revision)
+                     if path else None)
+        self._reindex(state, strategy, ranking, revision, graph)
+        return diff
+
+    def refresh(self, tenant: str, today: Optional[date] = None) -> dict:
+        """Rescore when the date has crossed the tenant's next urgency boundary."""
+        today = today or date.today()
+        with self._lock:
+            state = self._tenants.get(tenant)
+            if state is None or state.next_boundary is None or today < state.next_boundary:
+                return {}
+            if state.refreshed_on == today:
+                # Another subscriber already triggered this rescore.
+                return {}
+            state.refreshed_on = today
+            tasks, strategy, current = state.tasks, state.strategy, state.ranking
+            revision = state.revision
+        if tasks is None:
+            tasks = _input_tasks(current)
+        ranking = analyze_tasks(tasks, strategy_name=strategy, today=today)
+        with self._writing(tenant) as path:
+            if state.revision != revision:
+                # A concurrent update, or a newer graph file from another
+                # worker, replaced the ranking meanwhile; let the next
+                # check decide whether it still needs this.
+                with self._lock:
+                    state.refreshed_on = None
+                return {}
+            diff = diff_rankings(state.ranking, ranking)
+            with self._lock:
+                self._publish(tenant, state, ranking, today, diff)
+                version, revision = state.version, state.revision
+            # Scores and reasons can change without any rank or label
+            # moving, and the graph file must still match what the hub serves.
+            graph = (self._persist(path, state, ranking, strategy, today, version, revision)
+                     if path else None)
+        self._reindex(state, strategy, ranking, revision, graph)
+        return diff
+
+    def _persist(self, path: str, state: TenantRanking, ranking: List[dict],
+                 strategy: str, today: date, version: int, revision: int
+                 ) -> Optional[TaskGraph]:
+        """
+        Write ``ranking`` to the tenant's graph file (the caller is inside
+        ``_writing``) and serve it from the mapping from now on. Returns
+        the mapped graph.
+        """
+        stamp = write_task_graph(path, ranking, {
+            "strategy": strategy,
+            "scored_on": today.isoformat(),
+            "version": version,
+        })
+        graph = open_task_graph(path)
+        with self._lock:
+            state.graph_stamp = stamp
+            if graph is None or graph.stamp != stamp or state.revision != revision:
+                return None
+            # The decoded rows and input tasks can be freed.
+            state.ranking, state.tasks = graph, None
+        return graph
+
+    def _graph_path(self, tenant: str) -> Optional[str]:
+        try:
+            return tenant_graph_path(tenant)
+        except ValueError:
+            return None
+
+    def _graph_changed(self, tenant: str) -> bool:
+        """Whether another process wrote a graph file this one has not seen."""
+        path = self._graph_path(tenant)
+        if path is None:
+            return False
+        stamp = graph_stamp(path)
+        with self._lock:
+            state = self._tenants.get(tenant)
+            seen = state.graph_stamp if state is not None else None
+        return stamp is not None and stamp != seen
+
+    def sync(self, tenant: str) -> dict:
+        """
+        Adopt the ranking in the tenant's graph file when another worker
+        process wrote it, and publish the diff to local subscribers.
+
+        Single-flight: concurrent calls for a tenant wait for the first
+        one and then find the file already adopted.
+        """
+        if not self._graph_changed(tenant):
+            return {}
+        with self._tenant_lock(tenant):
+            return self._adopt(tenant, self._graph_path(tenant))
+
+    def _adopt(self, tenant: str, path: str) -> dict:
+        """``sync`` for a caller that holds the tenant lock."""
+        graph = open_task_graph(path)
+        if graph is None:
+            return {}
+        with self._lock:
+            state = self._state(tenant)
+            if state.graph_stamp == graph.stamp:
+                return {}
+        meta = graph.meta
+        today = _parse_date(meta.get("scored_on")) or date.today()
+        diff = diff_rankings(state.ranking, graph)
+        with self._lock:
+            state.graph_stamp = graph.stamp
+            state.tasks = None
+            state.strategy = meta.get("strategy", DEFAULT_STRATEGY)
+            # Keep the mapping itself; indexes are rebuilt from it lazily
+            # by the next query.
+            self._publish(tenant, state, graph, today, diff, meta.get("version", 0))
+        return diff
+
+    def _reindex(self, state: TenantRanking, strategy: str, ranking: Sequence[dict],
+                 revision: int, graph: Optional[TaskGraph] = None):
+        with self._lock:
+            entry = state.indexes.setdefault(strategy, TenantIndex())
+        with entry.lock:
+            # Rescores can finish out of order; keep the newest.
+            if revision > entry.revision:
+                entry.index.update(ranking)
+                entry.revision = revision
+                if graph is not None:
+                    # Same rows; answer from the shared mapping.
+                    entry.index.ranking = graph
+
+    def _publish(self, tenant: str, state: TenantRanking, ranking: Sequence[dict],
+                 today: date, diff: dict, version: Optional[int] = None):
+        """
+        Make ``ranking`` current and wake the tenant's subscribers if
+        ``diff`` (from the current ranking) is not empty. Called with the
+        tenant lock and the hub lock held.
+
+        ``version`` is that of an adopted graph file; versions never go
+        backwards, even if the file was recreated.
+        """
+        previous = state.version
+        state.revision += 1
+        state.ranking = ranking
+        state.today = today
+        state.next_boundary = _next_urgency_boundary(ranking, today)
+        if diff:
+            state.version = max(previous + 1, version or 0)
+        elif version is not None and version > previous:
+            state.version = version
+        if diff:
+            diff["version"] = state.version
+            payload = json.dumps(diff)
+            state.history.append((state.version, previous, payload))
+            state.history_bytes += len(payload)
+            while len(state.history) > 1 and (
+                len(state.history) > HISTORY_SIZE or state.history_bytes > HISTORY_BYTES
+            ):
+                state.history_bytes -= len(state.history.popleft()[2])
+            for loop, event in self._waiters.pop(tenant, {}).items():
+                loop.call_soon_threadsafe(event.set)
+
+    # ----- reads -----
+
+    def ranking(self, tenant: str) -> Tuple[int, Sequence[dict]]:
+        with self._lock:
+            state = self._tenants.get(tenant)
+            if state is None:
+                return 0, []
+            return state.version, state.ranking
+
+    def query(self, tenant: str, query: RankingQuery, strategy: Optional[str] = None,
+              admit: Optional[Callable[[int], ContextManager]] = None
+              ) -> Tuple[str, List[dict]]:
+        """
+        Run ``query`` against the tenant's index for ``strategy`` (default:
+        the strategy of the last update). Returns (strategy, matching rows).
+
+        Bringing a stale index up to date (rescoring the tasks for another
+        strategy, or indexing an adopted graph) runs inside ``admit(cost)``
+        when given, e.g. a ``FairScheduler.admit`` with the tenant bound,
+        with ``cost`` as in ``scheduling.estimate_cost``.
+        """
+        self.sync(tenant)
+        with self._lock:
+            state = self._tenants.get(tenant)
+            if state is None:
+                return strategy or DEFAULT_STRATEGY, []
+            strategy = strategy or state.strategy
+            entry = state.indexes.setdefault(strategy, TenantIndex())
+            revision, tasks, today = state.revision, state.tasks, state.today
+            current = state.ranking
+            ranking = current if strategy == state.strategy else None
+        if entry.revision < revision:
+            if isinstance(current, TaskGraph):
+                cost = len(current) + current.dependency_count()
+            else:
+                cost = estimate_cost(tasks or [])
+            with admit(cost) if admit is not None else nullcontext():
+                if ranking is None:
+                    if tasks is None:
+                        tasks = _input_tasks(current)
+                    ranking = analyze_tasks(tasks, strategy_name=strategy,
+                                            today=today or date.today())
+                self._reindex(state, strategy, ranking, revision)
+        with entry.lock:
+            return strategy, entry.index.query(query)
+
+    def events_since(self, tenant: str, version: int) -> Optional[List[Tuple[int, str]]]:
+        """
+        Diffs newer than ``version``, or None if some were already dropped
+        from the history and the subscriber needs a full snapshot.
+        """
+        with self._lock:
+            state = self._tenants.get(tenant)
+            if state is None:
+                return [] if version == 0 else None
+            if version > state.version:
+                return None
+            if version == state.version:
+                return []
+            # Each diff applies on top of its previous version only; the
+            # chain must lead from ``version`` to the current one.
+            events, at = [], version
+            for v, previous, payload in state.history:
+                if v <= version:
+                    continue
+                if previous != at:
+                    return None
+                events.append((v, payload))
+                at = v
+            return events if at == state.version else None
+
+    def _waiter(self, tenant: str) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waiters = self._waiters.setdefault(tenant, {})
+            event = waiters.get(loop)
+            if event is None:
+                event = waiters[loop] = asyncio.Event()
+            return event
+
+    def _seconds_until_boundary(self, tenant: str) -> Optional[float]:
+        with self._lock:
+            state = self._tenants.get(tenant)
+            boundary = state.next_boundary if state is not None else None
+        if boundary is None:
+            return None
+        delta = datetime.combine(boundary, time.min) - datetime.now()
+        return max(0.0, delta.total_seconds())
+
+    # ----- subscription -----
+
+    def _snapshot_event(self, tenant: str) -> Tuple[int, str]:
+        version, ranking = self.ranking(tenant)
+        ids, labels = _ids_and_labels(ranking)
+        if isinstance(ranking, TaskGraph):
+            scores = ranking.column("score").tolist()
+        else:
+            scores = [t["score"] for t in ranking]
+        rows = [list(row) for row in zip(ids, scores, labels)]
+        return version, _sse("snapshot", version, json.dumps({"version": version, "ranking": rows}))
+
+    def _join(self, tenant: str):
+        """Count a subscriber; the first one on a loop starts the poller."""
+        loop = asyncio.get_running_loop()
+        key = (loop, tenant)
+        with self._lock:
+            self._subscribers[key] = self._subscribers.get(key, 0) + 1
+            poller = self._pollers.get(key)
+            if (poller is None or poller.done()) and self._graph_path(tenant) is not None:
+                self._pollers[key] = loop.create_task(self._poll(tenant))
+
+    def _leave(self, tenant: str):
+        """Uncount a subscriber; the last one stops the poller."""
+        loop = asyncio.get_running_loop()
+        key = (loop, tenant)
+        with self._lock:
+            self._subscribers[key] -= 1
+            if self._subscribers[key]:
+                return
+            del self._subscribers[key]
+            poller = self._pollers.pop(key, None)
+            waiters = self._waiters.get(tenant, {})
+            waiters.pop(loop, None)
+            if not waiters:
+                self._waiters.pop(tenant, None)
+        if poller is not None:
+            poller.cancel()
+
+    async def _poll(self, tenant: str):
+        """
+        Adopt graph files written by other workers on behalf of all of
+        this loop's subscribers; file checks run off the event loop.
+        """
+        while True:
+            await asyncio.sleep(POLL_SECONDS)
+            await asyncio.to_thread(self.sync, tenant)
+
+    async def subscribe(self, tenant: str, last_version: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Yield SSE frames for ``tenant``: a full snapshot first (unless the
+        client can resume from ``last_version``), then one ``diff`` event
+        per ranking change.
+        """
+        self._join(tenant)
+        try:
+            async for frame in self._stream(tenant, last_version):
+                yield frame
+        finally:
+            self._leave(tenant)
+
+    async def _stream(self, tenant: str, last_version: Optional[int]) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        yield "retry: 5000\n\n"
+        if self._graph_path(tenant) is not None:
+            await asyncio.to_thread(self.sync, tenant)
+        if last_version is None or self.events_since(tenant, last_version) is None:
+            version, frame = self._snapshot_event(tenant)
+            yield frame
+        else:
+            version = last_version
+        last_sent = loop.time()
+
+        while True:
+            # Grab the event before checking for news so a publish in
+            # between cannot be missed.
+            event = self._waiter(tenant)
+            pending = self.events_since(tenant, version)
+            if pending is None:
+                version, frame = self._snapshot_event(tenant)
+                yield frame
+                last_sent = loop.time()
+                continue
+            for v, payload in pending:
+                version = v
+                yield _sse("diff", v, payload)
+                last_sent = loop.time()
+            if pending:
+                continue
+
+            timeout = max(0.0, last_sent + HEARTBEAT_SECONDS - loop.time())
+            until_boundary = self._seconds_until_boundary(tenant)
+            if until_boundary is not None:
+                timeout = min(timeout, until_boundary + 1)
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            if self._seconds_until_boundary(tenant) == 0:
+                await asyncio.to_thread(self.refresh, tenant)
+            if loop.time() - last_sent >= HEARTBEAT_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = loop.time()
+
+
+def _sse(event: str, version: int, data: str) -> str:
+    return f"id: {version}\nevent: {event}\ndata: {data}\n\n"
+
+
+# Process-wide hub used by the views.
+hub = RankingHub()
@@ -0,0 +1,122 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks.dedupe import DEFAULT_THRESHOLD, duplicate_pairs_naive, find_duplicates
+
+
+VERBS = ["Fix", "Add", "Refactor", "Update", "Remove", "Document", "Test", "Migrate",
+         "Review", "Optimize", "Design", "Deploy", "Investigate", "Clean up"]
+NOUNS = ["login", "payment", "search", "invoice", "profile", "export", "import", "cache",
+         "dashboard", "report", "billing", "onboarding", "settings", "API", "webhook",
+         "scheduler", "notification", "audit log", "permissions", "checkout"]
+QUALIFIERS = ["bug", "flow", "module", "page", "endpoint", "tests", "docs", "service",
+              "job", "UI", "timeout", "edge cases", "performance", "validation"]
+
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "te", "vo", "zi", "pa",
+             "bre", "dro", "fla", "gri", "ko", "tu", "xe", "yo", "wa", "qu"]
+
+
+def _names(rng, n):
+    """Made-up customer/project names so titles are not all templates."""
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            for _ in range(n)]
+
+
+def _title(rng, names):
+    title = f"{rng.choice(VERBS)} {rng.choice(NOUNS)} {rng.choice(QUALIFIERS)}"
+    if rng.random() < 0.8:
+        title += f" for {rng.choice(names)}"
+    return title
+
+
+def _near_duplicate(rng, title):
+    choice = rng.randrange(4)
+    if choice == 0:
+        return title.upper() + "!"
+    pos = rng.randrange(1, len(title) - 1)
+    if choice == 1:
+        # Drop a character
+        return title[:pos] + title[pos + 1:]
+    if choice == 2:
+        # Double a character
+        return title[:pos] + title[pos] + title[pos:]
+    # Swap two neighbouring characters
+    return title[:pos] + title[pos + 1] + title[pos] + title[pos + 2:]
+
+
+def make_titles(n, duplicate_rate, seed):
+    """
+    Return ``(titles, planted)`` where ``planted`` lists the
+    ``(original, near_duplicate)`` index pairs that were generated.
+    """
+    rng = random.Random(seed)
+    names = _names(rng, max(100, n // 20))
+    titles, planted = [], []
+    for _ in range(n):
+        if titles and rng.random() < duplicate_rate:
+            source = rng.randrange(len(titles))
+            planted.append((source, len(titles)))
+            titles.append(_near_duplicate(rng, titles[source]))
+        else:
+            titles.append(_title(rng, names))
+    return titles, planted
+
+
+def recall(groups, titles, planted, threshold):
+    """
+    Share of planted pairs at or above the threshold that ended up in the
+    same group. Edits that push a short title below it are not counted.
+    """
+    group_of = {idx: k for k, group in enumerate(groups) for idx in group}
+    found = expected = 0
+    for a, b in planted:
+        if duplicate_pairs_naive([titles[a], titles[b]], threshold):
+            expected += 1
+            found += a in group_of and group_of[a] == group_of.get(b)
+    return found / expected if expected else 1.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark LSH duplicate detection against the naive pairwise "
+        "check (extrapolated from a sample) and report its recall on the "
+        "planted near-duplicates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+",
+                            default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--duplicate-rate", type=float, default=0.1)
+        parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+        parser.add_argument("--naive-sample", type=int, default=1000,
+                            help="Titles used to time the O(n²) baseline.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        threshold = options["threshold"]
+
+        sample, _ = make_titles(options["naive_sample"], options["duplicate_rate"], options["seed"])
+        start = time.perf_counter()
+        duplicate_pairs_naive(sample, threshold)
+        sample_pairs = len(sample) * (len(sample) - 1) / 2
+        per_pair = (time.perf_counter() - start) / max(sample_pairs, 1)
+
+        self.stdout.write(
+            f"{'titles':>10} {'groups':>8} {'flagged':>8} "
+            f"{'lsh (s)':>8} {'titles/s':>10} {'recall':>7} {'naive est. (s)':>15}"
+        )
+        for n in options["sizes"]:
+            titles, planted = make_titles(n, options["duplicate_rate"], options["seed"])
+            start = time.perf_counter()
+            groups = find_duplicates(titles, threshold)
+            elapsed = time.perf_counter() - start
+            flagged = sum(len(g) - 1 for g in groups)
+            naive = per_pair * n * (n - 1) / 2
+            self.stdout.write(
+                f"{n:>10} {len(groups):>8} {flagged:>8} "
+                f"{elapsed:>8.2f} {n / elapsed:>10.0f} "
+                f"{recall(groups, titles, planted, threshold):>7.2%} {naive:>15.0f}"
+            )
@@ -0,0 +1,387 @@
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.scheduling import percentile
+
+
+SERVER_COMMANDS = {
+    # Threaded workers: with gunicorn's default sync workers each process
+    # handles one request at a time, so the per-process scoring scheduler
+    # (tasks.scheduling) would never queue, share or defer anything.
+    "gunicorn": ["gunicorn", "task_analyzer.wsgi:application",
+                 "--workers", "{workers}", "--worker-class", "gthread",
+                 "--threads", "{threads}", "--bind", "127.0.0.1:{port}"],
+    "uvicorn": ["uvicorn", "task_analyzer.asgi:application",
+                "--workers", "{workers}", "--host", "127.0.0.1", "--port", "{port}",
+                "--no-access-log"],
+}
+
+
+# ---------- Helpers ----------
+
+def parse_weights(value, cast=str):
+    """Parse ``"a:0.8,b:0.2"`` into a list of (key, weight)."""
+    pairs = []
+    for item in value.split(","):
+        key, _, weight = item.partition(":")
+        pairs.append((cast(key.strip()), float(weight or 1)))
+    return pairs
+
+
+def is_saturated(step, max_error_rate, slo_p99_ms, min_throughput_ratio=0.9):
+    """
+    A step is saturated when the server can no longer keep up with the
+    rate actually sent, errors exceed the budget, or p99 breaks the SLO.
+    """
+    return (
+        step["achieved_rps"] < min_throughput_ratio * step["sent_rps"]
+        or step["error_rate"] > max_error_rate
+        or step["latency_ms"]["p99"] > slo_p99_ms
+    )
+
+
+def make_tasks(n, rng):
+    today = date.today()
+    tasks = []
+    for i in range(n):
+        deps = [f"T{rng.randrange(i)}"] if i and rng.random() < 0.3 else []
+        tasks.append({
+            "id": f"T{i}",
+            "title": f"Load test task {i}",
+            "due_date": (today + timedelta(days=rng.randint(-5, 60))).isoformat(),
+            "estimated_hours": round(rng.uniform(0.5, 16), 1),
+            "importance": rng.randint(1, 10),
+            "dependencies": deps,
+        })
+    return tasks
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _process_tree(pid):
+    """``pid`` and all its descendants (Linux /proc only)."""
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as fh:
+                    pending.extend(int(c) for c in fh.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def _rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+# ---------- Load generation ----------
+
+class _Client:
+    """Keep-alive HTTP connection per client thread."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def request(self, method, path, body=None):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        headers = {"Content-Type": "application/json"} if body else {}
+        try:
+            conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self.local.conn = None
+            raise
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the project under gunicorn or uvicorn and drive the analyze and "
+        "suggest endpoints with an open-loop load generator at increasing rates. "
+        "Reports throughput, latency percentiles, error rate, per-worker memory "
+        "and the saturation point."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=sorted(SERVER_COMMANDS), default="gunicorn")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=8,
+                            help="Threads per gunicorn worker; keep it above "
+                                 "TASKS_SCHED_SLOTS + TASKS_SCHED_FAST_LANE_SLOTS.")
+        parser.add_argument("--url", help="Target an already running server instead of starting one.")
+        parser.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20, 40, 80, 160],
+                            help="Offered request rates (req/s), one step each.")
+        parser.add_argument("--duration", type=float, default=15, help="Seconds per step.")
+        parser.add_argument("--mix", default="analyze:0.8,suggest:0.2",
+                            help="Endpoint weights.")
+        parser.add_argument("--sizes", default="10:0.6,100:0.3,1000:0.1",
+                            help="Analyze payload sizes (tasks per request) and weights.")
+        parser.add_argument("--max-in-flight", type=int, default=256,
+                            help="Client threads; arrivals beyond this queue client-side.")
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--slo-p99-ms", type=float, default=1000)
+        parser.add_argument("--max-error-rate", type=float, default=0.01)
+        parser.add_argument("--keep-going", action="store_true",
+                            help="Run all steps even after saturation.")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        mix = parse_weights(options["mix"])
+        sizes = parse_weights(options["sizes"], cast=int)
+        for endpoint, _ in mix:
+            if endpoint not in ("analyze", "suggest"):
+                raise CommandError(f"Unknown endpoint in --mix: {endpoint}")
+
+        bodies = {
+            size: json.dumps({"strategy": "smart_balance", "tasks": make_tasks(size, rng)})
+            for size, _ in sizes
+        }
+
+        server = None
+        base_url = options["url"]
+        if not base_url:
+            server, base_url = self._start_server(options)
+        try:
+            report = self._run(options, base_url, server, mix, sizes, bodies, rng)
+        finally:
+            if server is not None:
+                server.terminate()
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    # ----- server lifecycle -----
+
+    def _start_server(self, options):
+        name = options["server"]
+        if shutil.which(name) is None:
+            raise CommandError(f"{name} is not installed.")
+        port = _free_port()
+        cmd = [part.format(workers=options["workers"], threads=options["threads"], port=port)
+               for part in SERVER_COMMANDS[name]]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            "DJANGO_SETTINGS_MODULE", "task_analyzer.settings"))
+        server = subprocess.Popen(cmd, cwd=settings.BASE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base_url = f"http://127.0.0.1:{port}/api"
+
+        client = _Client(base_url, timeout=2)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"{name} exited with code {server.returncode}.")
+            try:
+                if client.request("GET", "/tasks/suggest/") == 200:
+                    self.stdout.write(f"Started {name} with {options['workers']} worker(s) on port {port}")
+                    return server, base_url
+            except (OSError, http.client.HTTPException):
+                time.sleep(0.2)
+        server.kill()
+        raise CommandError(f"{name} did not become ready within 30s.")
+
+    # ----- measurement -----
+
+    def _run(self, options, base_url, server, mix, sizes, bodies, rng):
+        client = _Client(base_url, options["timeout"])
+        steps = []
+        saturation = None
+
+        self.stdout.write(
+            f"{'offered':>8} {'achieved':>9} {'errors':>7} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'max RSS MB':>11}"
+        )
+        for rate in options["rates"]:
+            step = self._run_step(client, rate, options, server, mix, sizes, bodies, rng)
+            steps.append(step)
+            self.stdout.write(
+                f"{step['offered_rps']:>8.1f} {step['achieved_rps']:>9.1f} "
+                f"{step['error_rate']:>7.2%} {step['latency_ms']['p50']:>8.1f} "
+                f"{step['latency_ms']['p95']:>8.1f} {step['latency_ms']['p99']:>8.1f} "
+                f"{max(step['worker_rss_mb'].values(), default=0):>11.1f}"
+            )
+            if saturation is None and is_saturated(
+                step, options["max_error_rate"], options["slo_p99_ms"]
+            ):
+                saturation = step["offered_rps"]
+                if not options["keep_going"]:
+                    break
+
+        sustainable = [s["offered_rps"] for s in steps
+                       if not is_saturated(s, options["max_error_rate"], options["slo_p99_ms"])]
+        if saturation is None:
+            self.stdout.write("No saturation within the tested rates.")
+        else:
+            self.stdout.write(f"Saturated at {saturation:g} req/s.")
+
+        return {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "config": {
+                "server": None if options["url"] else options["server"],
+                "workers": None if options["url"] else options["workers"],
+                "threads": options["threads"] if options["server"] == "gunicorn" and not options["url"] else None,
+                "url": base_url,
+                "duration_s": options["duration"],
+                "mix": dict(mix),
+                "sizes": {str(k): v for k, v in sizes},
+                "slo_p99_ms": options["slo_p99_ms"],
+                "max_error_rate": options["max_error_rate"],
+            },
+            "steps": steps,
+            "saturation": {
+                "saturated_at_rps": saturation,
+                "max_sustainable_rps": max(sustainable, default=None),
+            },
+        }
+
+    def _run_step(self, client, rate, options, server, mix, sizes, bodies, rng):
+        duration = options["duration"]
+        endpoints, endpoint_weights = zip(*mix)
+        size_keys, size_weights = zip(*sizes)
+
+        # Poisson arrivals, fixed up-front so sending never waits on replies.
+        schedule, t = [], rng.expovariate(rate)
+        while t < duration:
+            endpoint = rng.choices(endpoints, endpoint_weights)[0]
+            size = rng.choices(size_keys, size_weights)[0] if endpoint == "analyze" else None
+            schedule.append((t, endpoint, size))
+            t += rng.expovariate(rate)
+
+        results = []
+        results_lock = threading.Lock()
+
+        def send(scheduled_at, endpoint, size):
+            status_code = None
+            try:
+                if endpoint == "analyze":
+                    status_code = client.request("POST", "/tasks/analyze/", bodies[size])
+                else:
+                    status_code = client.request("GET", "/tasks/suggest/")
+            except (OSError, http.client.HTTPException):
+                pass
+            # Latency is measured from the scheduled send time, so client-side
+            # queueing under overload counts (no coordinated omission).
+            latency = (time.perf_counter() - scheduled_at) * 1000.0
+            ok = status_code is not None and 200 <= status_code < 400
+            with results_lock:
+                results.append((endpoint, size, latency, ok))
+
+        rss = {}
+        stop_sampling = threading.Event()
+
+        def sample_memory():
+            while True:
+                if server is not None:
+                    for pid in _process_tree(server.pid):
+                        value = _rss_mb(pid)
+                        if value is not None:
+                            rss[pid] = max(rss.get(pid, 0.0), value)
+                if stop_sampling.wait(0.5):
+                    return
+
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["max_in_flight"]) as pool:
+            for offset, endpoint, size in schedule:
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(send, start + offset, endpoint, size)
+        elapsed = time.perf_counter() - start
+        stop_sampling.set()
+        sampler.join()
+
+        return self._summarize(rate, len(schedule) / duration, elapsed, results, rss)
+
+    @staticmethod
+    def _summarize(rate, sent_rps, elapsed, results, rss):
+        def stats(rows):
+            latencies = sorted(r[2] for r in rows)
+            errors = sum(1 for r in rows if not r[3])
+            return {
+                "requests": len(rows),
+                "errors": errors,
+                "error_rate": errors / len(rows) if rows else 0.0,
+                "latency_ms": {
+                    "p50": percentile(latencies, 50),
+                    "p95": percentile(latencies, 95),
+                    "p99": percentile(latencies, 99),
+                    "max": latencies[-1] if latencies else 0.0,
+                },
+            }
+
+        succeeded = sum(1 for r in results if r[3])
+        summary = {
+            "offered_rps": rate,
+            # Poisson arrivals make the realised rate differ from the target.
+            "sent_rps": sent_rps,
+            "achieved_rps": succeeded / elapsed if elapsed else 0.0,
+        }
+        summary.update(stats(results))
+
+        by_endpoint = {}
+        for row in results:
+            key = f"analyze[{row[1]}]" if row[0] == "analyze" else row[0]
+            by_endpoint.setdefault(key, []).append(row)
+        summary["by_endpoint"] = {key: stats(rows) for key, rows in sorted(by_endpoint.items())}
+        summary["worker_rss_mb"] = {str(pid): round(mb, 1) for pid, mb in sorted(rss.items())}
+        return summary
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
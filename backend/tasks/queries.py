@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from datetime import date
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .scoring import _parse_date
+
+
+# ---------- Query description ----------
+
+@dataclass
+class RankingQuery:
+    labels: Optional[Sequence[str]] = None
+    due_after: Optional[date] = None
+    due_before: Optional[date] = None
+    min_importance: Optional[int] = None
+    max_importance: Optional[int] = None
+    min_blocks: Optional[int] = None
+    max_blocks: Optional[int] = None
+    limit: int = 20
+
+
+# An update touching more than max(_REBUILD_MIN, n // _REBUILD_FRACTION)
+# tasks re-sorts every index instead of patching entries one by one.
+_REBUILD_MIN = 64
+_REBUILD_FRACTION = 8
+
+# Sentinels that sort below/above every (rank,) suffix.
+_LOW: Tuple = (float("-inf"),)
+_HIGH: Tuple = (float("inf"),)
+
+
+# ---------- Index ----------
+
+class RankingIndex:
+    """
+    Secondary sorted indexes over one scored ranking.
+
+    Every entry ends in the task's rank, its position in the ranking, so
+    tied scores keep the order ``analyze_tasks`` gave them:
+
+    - ``by_rank``          ``(rank,)`` for all tasks
+    - ``by_label[label]``  ``(rank,)`` for tasks with that priority label
+    - ``by_due``           ``(due ordinal, rank)`` for dated tasks
+    - ``by_importance``    ``(importance, rank)``
+    - ``by_blocks``        ``(tasks depending on it, rank)``
+
+    Result rows are read back from the ranking by rank, so the index
+    keeps no copy of them; the ranking can be a list of rows or a
+    memory-mapped ``TaskGraph``.
+
+    Queries that only filter on labels walk a rank-ordered list and stop
+    after ``limit`` matches: O(log n + k). With range filters, the
+    narrowest range (m tasks, sized by bisection) is either scanned for
+    the best ``limit`` in O(log n + m log k), or, when matches are dense
+    enough, the rank-ordered walk is used with the range as a filter.
+    """
+
+    def __init__(self, ranking: Sequence[dict] = ()):
+        self.ranking: Sequence[dict] = ()
+        self._ids: List[str] = []
+        self._entries: Dict[str, dict] = {}
+        self.by_rank: List[Tuple] = []
+        self.by_label: Dict[str, List[Tuple]] = {}
+        self.by_due: List[Tuple] = []
+        self.by_importance: List[Tuple] = []
+        self.by_blocks: List[Tuple] = []
+        self.update(ranking)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ----- maintenance -----
+
+    def _keys(self, rank: int, label: str, due_date, importance: Optional[int],
+              blocks: int) -> dict:
+        position = (rank,)
+        due = _parse_date(due_date)
+        return {
+            "rank": position,
+            "label": label,
+            "due": (due.toordinal(),) + position if due else None,
+            "importance": (importance,) + position if importance is not None else None,
+            "blocks": (blocks,) + position,
+        }
+
+    def _insert(self, keys: dict):
+        insort(self.by_rank, keys["rank"])
+        insort(self.by_label.setdefault(keys["label"], []), keys["rank"])
+        for name in ("due", "importance", "blocks"):
+            if keys[name] is not None:
+                insort(getattr(self, f"by_{name}"), keys[name])
+
+    def _delete(self, keys: dict):
+        _remove(self.by_rank, keys["rank"])
+        _remove(self.by_label[keys["label"]], keys["rank"])
+        for name in ("due", "importance", "blocks"):
+            if keys[name] is not None:
+                _remove(getattr(self, f"by_{name}"), keys[name])
+
+    def update(self, ranking: Sequence[dict]) -> int:
+        """
+        Bring the index in line with a freshly scored ranking, touching
+        only tasks whose rank or indexed values changed. Returns how many
+        tasks were inserted, moved or removed.
+        """
+        # Only the indexed fields, so a TaskGraph's rows are not all kept
+        # decoded at once.
+        fields = [
+            (row["id"], row["priority_label"], row["due_date"], row["importance"],
+             row["dependencies"])
+            for row in ranking
+        ]
+        blocks: Dict[str, int] = {}
+        for *_, deps in fields:
+            for dep in deps:
+                blocks[dep] = blocks.get(dep, 0) + 1
+
+        changes = []
+        for rank, (tid, label, due_date, importance, _) in enumerate(fields):
+            keys = self._keys(rank, label, due_date, importance, blocks.get(tid, 0))
+            if self._entries.get(tid) != keys:
+                changes.append((tid, keys))
+        ids = [tid for tid, *_ in fields]
+        present = set(ids)
+        removed = [tid for tid in self._entries if tid not in present]
+        self.ranking = ranking
+        self._ids = ids
+
+        if len(changes) + len(removed) > max(_REBUILD_MIN, len(ids) // _REBUILD_FRACTION):
+            # Each insort/remove shifts list memory; past this point one
+            # sort per index is cheaper than many point updates.
+            for tid in removed:
+                del self._entries[tid]
+            self._entries.update(changes)
+            self._rebuild()
+        else:
+            for tid in removed:
+                self._delete(self._entries.pop(tid))
+            for tid, keys in changes:
+                old = self._entries.get(tid)
+                if old is not None:
+                    self._delete(old)
+                self._insert(keys)
+                self._entries[tid] = keys
+        return len(changes) + len(removed)
+
+    def _rebuild(self):
+        entries = self._entries.values()
+        self.by_rank = sorted(keys["rank"] for keys in entries)
+        self.by_label = {}
+        for rank in self.by_rank:
+            self.by_label.setdefault(self._keys_at(rank)["label"], []).append(rank)
+        for name in ("due", "importance", "blocks"):
+            setattr(self, f"by_{name}", sorted(
+                keys[name] for keys in entries if keys[name] is not None
+            ))
+
+    def _keys_at(self, rank: Tuple) -> dict:
+        return self._entries[self._ids[rank[0]]]
+
+    # ----- queries -----
+
+    def query(self, q: RankingQuery) -> List[dict]:
+        """Top ``q.limit`` tasks in rank order matching every filter."""
+        ranges = []
+        if q.due_after or q.due_before:
+            lo = (q.due_after.toordinal(),) + _LOW if q.due_after else _LOW
+            hi = (q.due_before.toordinal(),) + _HIGH if q.due_before else _HIGH
+            ranges.append(_slice(self.by_due, lo, hi))
+        if q.min_importance is not None or q.max_importance is not None:
+            ranges.append(_slice(self.by_importance, *_bounds(q.min_importance, q.max_importance)))
+        if q.min_blocks is not None or q.max_blocks is not None:
+            ranges.append(_slice(self.by_blocks, *_bounds(q.min_blocks, q.max_blocks)))
+
+        if q.labels:
+            ordered_size = sum(len(self.by_label.get(label, ())) for label in set(q.labels))
+        else:
+            ordered_size = len(self.by_rank)
+
+        smallest = min(ranges, key=len, default=None)
+        if smallest is not None and not len(smallest):
+            return []
+        # A rank-order walk expects to visit about limit * ordered / m
+        # entries before collecting `limit` matches from a range of m.
+        if smallest is None or q.limit * ordered_size <= len(smallest) ** 2:
+            # Walk rank order and stop after `limit` matches.
+            if q.labels:
+                source: Iterator[Tuple] = heapq.merge(
+                    *(self.by_label.get(label, []) for label in set(q.labels))
+                )
+            else:
+                source = iter(self.by_rank)
+            matches = (key for key in source if self._matches(key[-1:], q))
+            return [self.ranking[key[-1]] for key in islice(matches, q.limit)]
+
+        # Scan the most selective range and keep the best `limit` by rank.
+        ranks = (key[-1] for key in smallest.items() if self._matches(key[-1:], q))
+        return [self.ranking[rank] for rank in heapq.nsmallest(q.limit, ranks)]
+
+    def _matches(self, rank: Tuple, q: RankingQuery) -> bool:
+        keys = self._keys_at(rank)
+        if q.labels and keys["label"] not in q.labels:
+            return False
+        if q.due_after or q.due_before:
+            if keys["due"] is None:
+                return False
+            due = keys["due"][0]
+            if q.due_after and due < q.due_after.toordinal():
+                return False
+            if q.due_before and due > q.due_before.toordinal():
+                return False
+        if q.min_importance is not None or q.max_importance is not None:
+            if keys["importance"] is None:
+                return False
+            if not _within(keys["importance"][0], q.min_importance, q.max_importance):
+                return False
+        if not _within(keys["blocks"][0], q.min_blocks, q.max_blocks):
+            return False
+        return True
+
+
+# ---------- Helpers ----------
+
+class _slice:
+    """Lazy view of ``values[lo:hi]`` located by bisection."""
+
+    def __init__(self, values: List[Tuple], lo: Tuple, hi: Tuple):
+        self.values = values
+        self.start = bisect_left(values, lo)
+        self.stop = bisect_right(values, hi)
+
+    def __len__(self) -> int:
+        return max(0, self.stop - self.start)
+
+    def items(self) -> Iterator[Tuple]:
+        # islice would step over the first `start` entries one by one.
+        values = self.values
+        return (values[i] for i in range(self.start, self.stop))
+
+
+def _bounds(low: Optional[int], high: Optional[int]) -> Tuple[Tuple, Tuple]:
+    return (
+        (low,) + _LOW if low is not None else _LOW,
+        (high,) + _HIGH if high is not None else _HIGH,
+    )
+
+
+def _within(value: int, low: Optional[int], high: Optional[int]) -> bool:
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def _remove(values: List[Tuple], key: Tuple):
+    idx = bisect_left(values, key)
+    if idx < len(values) and values[idx] == key:
+        del values[idx]
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+try:  # Brotli is optional; gzip is always available via zlib.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+
+# ---------- Configuration ----------
+
+# Bytes of encoded JSON buffered before each compressor flush.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def available_encodings() -> List[str]:
+    """Content codings this server can produce, in order of preference."""
+    encodings = ["gzip"]
+    if brotli is not None:
+        encodings.insert(0, "br")
+    return encodings
+
+
+# ---------- ETags ----------
+
+def compute_etag(*parts) -> str:
+    """
+    Build a strong ETag from the canonical JSON form of ``parts``.
+    Keys are sorted and dates are stringified, so equivalent inputs
+    always hash to the same tag.
+    """
+    canonical = json.dumps(
+        parts, sort_keys=True, separators=(",", ":"), default=str
+    ).encode("utf-8")
+    return '"%s"' % hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+
+def representation_etag(etag: str, encoding: Optional[str]) -> str:
+    """Strong ETags must differ between content codings of the same body."""
+    if not encoding:
+        return etag
+    return '"%s-%s"' % (etag.strip('"'), encoding)
+
+
+def etag_matches(request, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored."""
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    if "*" in candidates:
+        return True
+    return etag in {c[2:] if c.startswith("W/") else c for c in candidates}
+
+
+# ---------- Content negotiation ----------
+
+def negotiate_encoding(request) -> Optional[str]:
+    """
+    Pick the best content coding from Accept-Encoding.
+    Returns None when the client only accepts an identity response.
+    """
+    header = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    if not header:
+        return None
+
+    accepted = {}
+    for item in header.split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+
+    for encoding in available_encodings():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+def _compressor(encoding: str):
+    if encoding == "br":
+        return brotli.Compressor()
+    # wbits=16+MAX_WBITS makes zlib emit a gzip header/trailer.
+    return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def _compressed_chunks(chunks: Iterable[str], encoding: str) -> Iterator[bytes]:
+    compressor = _compressor(encoding)
+    if encoding == "br":
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compress, finish = compressor.compress, compressor.flush
+
+    buffer: List[bytes] = []
+    buffered = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= STREAM_CHUNK_SIZE:
+            out = compress(b"".join(buffer))
+            buffer, buffered = [], 0
+            if out:
+                yield out
+    if buffer:
+        out = compress(b"".join(buffer))
+        if out:
+            yield out
+    yield finish()
+
+
+# ---------- Responses ----------
+
+def not_modified_response(etag: str) -> Response:
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response["ETag"] = etag
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
+def json_response(payload: dict, etag: str, encoding: Optional[str]):
+    """
+    Return ``payload`` as JSON tagged with ``etag``.
+    When a content coding was negotiated, the body is encoded and
+    compressed incrementally instead of being materialised in memory.
+    """
+    if encoding is None:
+        response = Response(payload, status=status.HTTP_200_OK)
+    else:
+        encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        response = StreamingHttpResponse(
+            _compressed_chunks(encoder.iterencode(payload), encoding),
+            content_type="application/json",
+        )
+        response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
+# ---------- Field selection ----------
+
+def parse_fields(value: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """
+    Parse a ``fields=a,b,c`` query parameter.
+    Returns None when no selection was requested and raises ValueError
+    naming any field that is not part of the output schema.
+    """
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = sorted(set(fields) - set(allowed))
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+
+
+# ---------- Configuration ----------
+
+# Concurrent scoring jobs per process in the shared (fair-queued) lane.
+SLOTS = getattr(settings, "TASKS_SCHED_SLOTS", 4)
+# Extra slots reserved for small requests so they never wait behind big ones.
+FAST_LANE_SLOTS = getattr(settings, "TASKS_SCHED_FAST_LANE_SLOTS", 2)
+FAST_LANE_MAX_COST = getattr(settings, "TASKS_SCHED_FAST_LANE_MAX_COST", 500)
+# Extra cost per task of duplicate detection, relative to one unit of
+# scoring work (see the "Duplicate detection" timings in the README).
+DEDUPE_COST_PER_TASK = getattr(settings, "TASKS_SCHED_DEDUPE_COST_PER_TASK", 12)
+# A single request above this cost is refused outright (413).
+MAX_REQUEST_COST = getattr(settings, "TASKS_SCHED_MAX_REQUEST_COST", 2_000_000)
+# Queued + running cost above this defers new work with 429 + Retry-After.
+QUEUE_COST_BUDGET = getattr(settings, "TASKS_SCHED_QUEUE_COST_BUDGET", 5_000_000)
+# Longest a request may wait for a slot before it is deferred.
+MAX_WAIT_SECONDS = getattr(settings, "TASKS_SCHED_MAX_WAIT", 30)
+# Relative shares per tenant; unlisted tenants get 1.
+TENANT_WEIGHTS: Dict[str, float] = getattr(settings, "TASKS_SCHED_TENANT_WEIGHTS", {})
+# Only honour X-Tenant-ID when a trusted proxy sets it (and strips any
+# value sent by clients); otherwise callers could claim any tenant.
+TRUST_TENANT_HEADER = getattr(settings, "TASKS_SCHED_TRUST_TENANT_HEADER", False)
+# Per-tenant counters kept for metrics; idle tenants beyond this are dropped.
+MAX_TRACKED_TENANTS = getattr(settings, "TASKS_SCHED_MAX_TRACKED_TENANTS", 1000)
+
+# Recent wait times kept for percentile metrics.
+_WAIT_SAMPLES = 1000
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Task list is too large to score."
+    default_code = "request_too_large"
+
+
+# ---------- Cost estimation ----------
+
+def estimate_cost(tasks_data, dedupe: Optional[str] = None) -> int:
+    """
+    Cheap pre-validation estimate of scoring work: one unit per task plus
+    one per dependency edge, read straight from the raw request data.
+    With ``dedupe`` each task adds DEDUPE_COST_PER_TASK units.
+    """
+    if not isinstance(tasks_data, list):
+        return 0
+    cost = len(tasks_data)
+    if dedupe:
+        cost += DEDUPE_COST_PER_TASK * len(tasks_data)
+    for task in tasks_data:
+        if isinstance(task, dict):
+            deps = task.get("dependencies")
+            if isinstance(deps, list):
+                cost += len(deps)
+    return cost
+
+
+def request_tenant(request) -> str:
+    """
+    Tenant for scheduling: X-Tenant-ID (only with
+    TASKS_SCHED_TRUST_TENANT_HEADER), then the user, then the client IP.
+    """
+    tenant = request.headers.get("X-Tenant-ID") if TRUST_TENANT_HEADER else None
+    if tenant:
+        return tenant
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', 'unknown')}"
+
+
+# ---------- Scheduler ----------
+
+@dataclass(order=True)
+class _Ticket:
+    finish: float
+    seq: int
+    tenant: str = field(compare=False)
+    cost: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+@dataclass
+class _TenantStats:
+    queued: int = 0
+    running: int = 0
+    admitted: int = 0
+    rejected: int = 0
+
+
+class FairScheduler:
+    """
+    Admission control plus weighted fair queuing for scoring work.
+
+    Requests with cost <= fast_lane_max_cost first try a dedicated fast
+    lane. Everything else is queued by self-clocked fair queuing: each
+    ticket's finish tag is ``max(virtual_time, tenant's last finish) +
+    cost / weight`` and the lowest tag runs next. A tenant posting huge
+    lists therefore only delays its own backlog, not other tenants.
+
+    State is per process. It only takes effect when a process serves
+    requests concurrently (gunicorn's gthread workers, or ASGI); a sync
+    worker never has more than one request to schedule.
+    """
+
+    def __init__(self, slots: int = SLOTS, fast_lane_slots: int = FAST_LANE_SLOTS,
+                 fast_lane_max_cost: int = FAST_LANE_MAX_COST,
+                 max_request_cost: int = MAX_REQUEST_COST,
+                 queue_cost_budget: int = QUEUE_COST_BUDGET,
+                 max_wait: float = MAX_WAIT_SECONDS,
+                 weights: Optional[Dict[str, float]] = None,
+                 max_tracked_tenants: int = MAX_TRACKED_TENANTS):
+        self.slots = slots
+        self.fast_lane_slots = fast_lane_slots
+        self.fast_lane_max_cost = fast_lane_max_cost
+        self.max_request_cost = max_request_cost
+        self.queue_cost_budget = queue_cost_budget
+        self.max_wait = max_wait
+        self.weights = dict(TENANT_WEIGHTS if weights is None else weights)
+        self.max_tracked_tenants = max_tracked_tenants
+
+        self._cond = threading.Condition()
+        self._queue: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._busy = 0
+        self._fast_busy = 0
+        self._queued_cost = 0
+        self._running_cost = 0
+        # Exponentially weighted cost units processed per second, used to
+        # turn outstanding work into a Retry-After estimate.
+        self._throughput = 0.0
+        # Least recently active first, see _stats()
+        self._tenants: "OrderedDict[str, _TenantStats]" = OrderedDict()
+        self._waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    # ----- public API -----
+
+    @contextmanager
+    def admit(self, tenant: str, cost: int):
+        """
+        Block until ``tenant`` may run work of ``cost``; raises
+        RequestTooLarge or Throttled (429 with Retry-After) instead when
+        the work cannot be accepted.
+        """
+        lane = self._acquire(tenant, cost)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(tenant, cost, lane, time.monotonic() - started)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                "slots": self.slots,
+                "busy": self._busy,
+                "fast_lane_slots": self.fast_lane_slots,
+                "fast_lane_busy": self._fast_busy,
+                "queue_depth": sum(1 for t in self._queue if not t.cancelled),
+                "queued_cost": self._queued_cost,
+                "running_cost": self._running_cost,
+                "throughput_cost_per_s": round(self._throughput, 1),
+                "wait_seconds": {
+                    "samples": len(waits),
+                    "p50": round(percentile(waits, 50), 4),
+                    "p95": round(percentile(waits, 95), 4),
+                    "max": waits[-1] if waits else 0.0,
+                },
+                "tenants": {
+                    name: vars(stats).copy() for name, stats in sorted(self._tenants.items())
+                },
+            }
+
+    # ----- internals -----
+
+    def _acquire(self, tenant: str, cost: int) -> str:
+        with self._cond:
+            stats = self._stats(tenant)
+            if cost > self.max_request_cost:
+                stats.rejected += 1
+                raise RequestTooLarge(
+                    f"Estimated cost {cost} exceeds the limit of {self.max_request_cost}."
+                )
+
+            if cost <= self.fast_lane_max_cost and self._fast_busy < self.fast_lane_slots:
+                self._fast_busy += 1
+                self._start(stats, cost, 0.0)
+                return "fast"
+
+            outstanding = self._queued_cost + self._running_cost
+            if outstanding + cost > self.queue_cost_budget:
+                stats.rejected += 1
+                raise Throttled(wait=self._retry_after(outstanding + cost))
+
+            weight = self.weights.get(tenant, 1.0)
+            start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+            ticket = _Ticket(start + cost / weight, next(self._seq), tenant, cost,
+                             time.monotonic())
+            self._last_finish[tenant] = ticket.finish
+            heapq.heappush(self._queue, ticket)
+            self._queued_cost += cost
+            stats.queued += 1
+
+            granted = self._cond.wait_for(
+                lambda: self._busy < self.slots and self._queue[0] is ticket,
+                timeout=self.max_wait,
+            )
+            stats.queued -= 1
+            self._queued_cost -= cost
+            if not granted:
+                # Lazily dropped from the heap when it reaches the top.
+                ticket.cancelled = True
+                self._drop_cancelled()
+                stats.rejected += 1
+                self._cond.notify_all()
+                raise Throttled(wait=self._retry_after(self._queued_cost + self._running_cost))
+
+            heapq.heappop(self._queue)
+            self._virtual_time = ticket.finish
+            if len(self._last_finish) > 10_000:
+                # Tags at or below virtual time carry no state; forget them.
+                self._last_finish = {
+                    name: tag for name, tag in self._last_finish.items()
+                    if tag > self._virtual_time
+                }
+            self._busy += 1
+            self._start(stats, cost, time.monotonic() - ticket.enqueued_at)
+            self._drop_cancelled()
+            self._cond.notify_all()
+            return "shared"
+
+    def _stats(self, tenant: str) -> _TenantStats:
+        stats = self._tenants.get(tenant)
+        if stats is None:
+            stats = self._tenants[tenant] = _TenantStats()
+            if len(self._tenants) > self.max_tracked_tenants:
+                self._forget_idle_tenants()
+        self._tenants.move_to_end(tenant)
+        return stats
+
+    def _forget_idle_tenants(self):
+        # Tenants with queued or running work must keep their counters.
+        excess = len(self._tenants) - self.max_tracked_tenants
+        for name in list(self._tenants):
+            if excess <= 0:
+                break
+            stats = self._tenants[name]
+            if not stats.queued and not stats.running:
+                del self._tenants[name]
+                excess -= 1
+
+    def _start(self, stats: _TenantStats, cost: int, waited: float):
+        stats.running += 1
+        stats.admitted += 1
+        self._running_cost += cost
+        self._waits.append(waited)
+
+    def _release(self, tenant: str, cost: int, lane: str, elapsed: float):
+        with self._cond:
+            if lane == "fast":
+                self._fast_busy -= 1
+            else:
+                self._busy -= 1
+            self._running_cost -= cost
+            self._tenants[tenant].running -= 1
+            self._tenants.move_to_end(tenant)
+            if elapsed > 0:
+                rate = cost / elapsed
+                self._throughput = rate if not self._throughput else (
+                    0.8 * self._throughput + 0.2 * rate
+                )
+            self._cond.notify_all()
+
+    def _drop_cancelled(self):
+        while self._queue and self._queue[0].cancelled:
+            heapq.heappop(self._queue)
+
+    def _retry_after(self, outstanding: int) -> int:
+        if not self._throughput:
+            return 1
+        return int(min(60, max(1, outstanding / self._throughput)))
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+# Process-wide scheduler used by the views.
+scheduler = FairScheduler()
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from datetime import date, datetime
-from typing import Dict, List, Optional, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set, Union
+
+from .dedupe import DEDUPE_MODES, find_duplicates
 
 
 # ---------- Strategy Configuration ----------
@@ -61,9 +63,14 @@ class TaskInternal:
 
 # ---------- Helper functions ----------
 
-def _parse_date(value: Optional[str]) -> Optional[date]:
+def _parse_date(value: Optional[Union[str, date]]) -> Optional[date]:
     if not value:
         return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        # TaskInputSerializer already hands over parsed dates
+        return value
     try:
         # Accept "YYYY-MM-DD" or ISO-like formats
         return datetime.fromisoformat(value).date()
@@ -137,19 +144,80 @@ def _detect_cycles(tasks_by_id: Dict[str, TaskInternal]) -> Set[str]:
     return cycle_nodes
 
 
+def _apply_dedupe(internal_tasks: List[TaskInternal], mode: str) -> List[TaskInternal]:
+    """
+    Detect near-duplicate titles and either flag them ("flag") or fold
+    them into the earliest task of each group ("merge").
+
+    Merging rewrites dependencies that point at a dropped duplicate to
+    its canonical task, so duplicates no longer inflate dependents counts
+    or effort normalization. Flagging only annotates the reasons.
+    """
+    groups = find_duplicates([t.title for t in internal_tasks])
+    if not groups:
+        return internal_tasks
+
+    if mode == "flag":
+        for group in groups:
+            canonical = internal_tasks[group[0]]
+            others = [internal_tasks[i] for i in group[1:]]
+            canonical.reasons.append(
+                f"Has {len(others)} possible duplicate(s): "
+                f"{', '.join(t.id for t in others)}."
+            )
+            for t in others:
+                t.reasons.append(f"Possible duplicate of {canonical.id}.")
+        return internal_tasks
+
+    canonical_of: Dict[str, str] = {}
+    dropped: Set[int] = set()
+    for group in groups:
+        canonical = internal_tasks[group[0]]
+        others = [internal_tasks[i] for i in group[1:]]
+        for t in others:
+            canonical_of[t.id] = canonical.id
+            canonical.dependencies.extend(t.dependencies)
+            if canonical.due_date is None:
+                canonical.due_date = t.due_date
+            if canonical.estimated_hours is None:
+                canonical.estimated_hours = t.estimated_hours
+            if canonical.importance is None:
+                canonical.importance = t.importance
+        dropped.update(group[1:])
+        canonical.reasons.append(
+            f"Merged {len(others)} duplicate task(s): "
+            f"{', '.join(t.id for t in others)}."
+        )
+
+    kept = [t for i, t in enumerate(internal_tasks) if i not in dropped]
+    for t in kept:
+        deps: List[str] = []
+        for dep in t.dependencies:
+            dep = canonical_of.get(dep, dep)
+            if dep != t.id and dep not in deps:
+                deps.append(dep)
+        t.dependencies = deps
+    return kept
+
+
 # ---------- Core scoring function ----------
 
 def analyze_tasks(
     tasks: List[dict],
     strategy_name: str = DEFAULT_STRATEGY,
     today: Optional[date] = None,
+    dedupe: Optional[str] = None,
 ) -> List[dict]:
     """
     Main scoring function.
     - Accepts a list of task dicts.
+    - Optionally flags or merges near-duplicate tasks ("flag" / "merge");
+      any other ``dedupe`` value raises ValueError.
     - Applies the chosen strategy weights.
     - Returns a *sorted* list of enriched task dicts with scores & reasons.
     """
+    if dedupe and dedupe not in DEDUPE_MODES:
+        raise ValueError(f"dedupe must be one of: {', '.join(DEDUPE_MODES)}.")
     if today is None:
         today = date.today()
 
@@ -191,6 +259,10 @@ def analyze_tasks(
             )
         )
 
+    # 1b) Optional duplicate detection before any normalization
+    if dedupe:
+        internal_tasks = _apply_dedupe(internal_tasks, dedupe)
+
     tasks_by_id: Dict[str, TaskInternal] = {t.id: t for t in internal_tasks}
 
     # 2) Urgency scores
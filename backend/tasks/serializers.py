@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from .scoring import STRATEGIES
+
 
 class TaskInputSerializer(serializers.Serializer):
     id = serializers.CharField(required=False, allow_blank=True)
@@ -16,6 +18,11 @@ class TaskInputSerializer(serializers.Serializer):
 
 
 class TaskOutputSerializer(serializers.Serializer):
+    """
+    Accepts an optional ``fields`` argument listing the fields to keep,
+    so bulk clients can drop columns before they are serialized.
+    """
+
     id = serializers.CharField(required=False, allow_blank=True)
     title = serializers.CharField()
     due_date = serializers.DateField(required=False, allow_null=True)
@@ -34,3 +41,34 @@ class TaskOutputSerializer(serializers.Serializer):
     importance_score = serializers.FloatField()
     effort_score = serializers.FloatField()
     dependency_score = serializers.FloatField()
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RankingQuerySerializer(serializers.Serializer):
+    """Query parameters of TenantQueryView; ``label`` may be repeated."""
+
+    strategy = serializers.ChoiceField(choices=list(STRATEGIES), required=False)
+    label = serializers.ListField(
+        child=serializers.ChoiceField(choices=["Low", "Medium", "High"]),
+        required=False
+    )
+    due_after = serializers.DateField(required=False)
+    due_before = serializers.DateField(required=False)
+    min_importance = serializers.IntegerField(required=False, min_value=1, max_value=10)
+    max_importance = serializers.IntegerField(required=False, min_value=1, max_value=10)
+    min_blocks = serializers.IntegerField(required=False, min_value=0)
+    max_blocks = serializers.IntegerField(required=False, min_value=0)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=1000)
+
+
+class TenantTasksPageSerializer(serializers.Serializer):
+    """Query parameters of TenantTasksView.get."""
+
+    offset = serializers.IntegerField(required=False, default=0, min_value=0)
+    limit = serializers.IntegerField(required=False, default=100, min_value=1, max_value=1000)
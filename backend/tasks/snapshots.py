@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import json
+import os
+import struct
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# ---------- Configuration ----------
+
+SNAPSHOT_TTL = getattr(settings, "TASKS_SNAPSHOT_TTL", 600)
+DEFAULT_PAGE_SIZE = getattr(settings, "TASKS_SNAPSHOT_PAGE_SIZE", 100)
+MAX_PAGE_SIZE = getattr(settings, "TASKS_SNAPSHOT_MAX_PAGE_SIZE", 1000)
+# Directory shared by every worker process on the host. It must belong to
+# the server's user: anyone who can write there can plant pages.
+SNAPSHOT_DIR = getattr(
+    settings, "TASKS_SNAPSHOT_DIR", os.path.join(settings.BASE_DIR, "var", "snapshots")
+)
+# Total size of stored snapshots; the oldest are evicted beyond it.
+MAX_TOTAL_BYTES = getattr(settings, "TASKS_SNAPSHOT_MAX_BYTES", 256 * 1024 * 1024)
+
+_CURSOR_SALT = "tasks.snapshots.cursor"
+
+
+class SnapshotExpired(Exception):
+    """The snapshot a cursor points at has expired or was never stored."""
+
+
+class SnapshotTooLarge(Exception):
+    """A single snapshot would exceed TASKS_SNAPSHOT_MAX_BYTES on its own."""
+
+
+class InvalidCursor(Exception):
+    """The cursor was tampered with or is not a snapshot cursor."""
+
+
+# ---------- Storage ----------
+#
+# A snapshot is one file in SNAPSHOT_DIR, so any worker can serve any
+# page and there is no entry limit to evict pages of large rankings:
+#
+#   meta     one line of JSON (total, page_size, pages)
+#   offsets  pages + 1 little-endian u64 offsets into the page blob
+#   pages    one JSON array per page
+#
+# Serving a page reads the meta line, two offsets and that page only.
+# Files expire SNAPSHOT_TTL seconds after they were written, or earlier
+# when newer snapshots need the space (MAX_TOTAL_BYTES).
+
+_OFFSET = struct.Struct("<Q")
+
+# Directory that already passed _snapshot_dir()'s checks in this process
+_verified_dir: Optional[str] = None
+
+
+def _snapshot_dir() -> str:
+    """
+    SNAPSHOT_DIR, created private on first use. A directory owned by
+    another user, or writable by group or others, is refused.
+    """
+    global _verified_dir
+    if _verified_dir == SNAPSHOT_DIR:
+        return SNAPSHOT_DIR
+    os.makedirs(SNAPSHOT_DIR, mode=0o700, exist_ok=True)
+    stat = os.stat(SNAPSHOT_DIR)
+    owner_ok = not hasattr(os, "geteuid") or stat.st_uid == os.geteuid()
+    if not owner_ok or stat.st_mode & 0o022:
+        raise ImproperlyConfigured(
+            f"TASKS_SNAPSHOT_DIR ({SNAPSHOT_DIR}) must be owned by the server's "
+            f"user and not writable by group or others."
+        )
+    _verified_dir = SNAPSHOT_DIR
+    return SNAPSHOT_DIR
+
+
+def _snapshot_path(snapshot_id: str) -> str:
+    return os.path.join(_snapshot_dir(), f"{snapshot_id}.snap")
+
+
+def _make_room(directory: str, size: int, now: float):
+    """Delete expired snapshots, then the oldest until ``size`` more fit."""
+    live = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".snap"):
+            continue
+        try:
+            stat = entry.stat()
+            if stat.st_mtime + SNAPSHOT_TTL < now:
+                os.unlink(entry.path)
+            else:
+                live.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            # Another worker purged or replaced it first.
+            pass
+
+    total = sum(entry_size for _, entry_size, _ in live)
+    for _, entry_size, path in sorted(live):
+        if total + size <= MAX_TOTAL_BYTES:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= entry_size
+
+
+def store_snapshot(snapshot_id: str, rows: List[dict], page_size: int) -> dict:
+    """
+    Split a ranked list into pages and store them for SNAPSHOT_TTL
+    seconds. Raises SnapshotTooLarge above MAX_TOTAL_BYTES.
+    """
+    pages = max(1, -(-len(rows) // page_size))
+    meta = {"total": len(rows), "page_size": page_size, "pages": pages}
+    blobs = [
+        json.dumps(rows[p * page_size:(p + 1) * page_size], cls=JSONEncoder).encode("utf-8")
+        for p in range(pages)
+    ]
+
+    header = json.dumps(meta).encode("utf-8") + b"\n"
+    size = len(header) + _OFFSET.size * (pages + 1) + sum(len(blob) for blob in blobs)
+    if size > MAX_TOTAL_BYTES:
+        raise SnapshotTooLarge(snapshot_id)
+
+    directory = _snapshot_dir()
+    _make_room(directory, size, time.time())
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(header)
+            offset = 0
+            fh.write(_OFFSET.pack(offset))
+            for blob in blobs:
+                offset += len(blob)
+                fh.write(_OFFSET.pack(offset))
+            for blob in blobs:
+                fh.write(blob)
+        # Renamed into place so readers never see a partial snapshot.
+        os.replace(tmp_path, _snapshot_path(snapshot_id))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return meta
+
+
+def _open_snapshot(snapshot_id: str):
+    try:
+        fh = open(_snapshot_path(snapshot_id), "rb")
+    except FileNotFoundError:
+        return None
+    if os.fstat(fh.fileno()).st_mtime + SNAPSHOT_TTL < time.time():
+        fh.close()
+        return None
+    return fh
+
+
+def get_snapshot_meta(snapshot_id: str) -> Optional[dict]:
+    fh = _open_snapshot(snapshot_id)
+    if fh is None:
+        return None
+    with fh:
+        return json.loads(fh.readline())
+
+
+def load_page(snapshot_id: str, page: int) -> Tuple[dict, List[dict]]:
+    fh = _open_snapshot(snapshot_id)
+    if fh is None:
+        raise SnapshotExpired(snapshot_id)
+    with fh:
+        meta = json.loads(fh.readline())
+        if not 0 <= page < meta["pages"]:
+            raise SnapshotExpired(snapshot_id)
+        table = fh.tell()
+        fh.seek(table + page * _OFFSET.size)
+        start, = _OFFSET.unpack(fh.read(_OFFSET.size))
+        stop, = _OFFSET.unpack(fh.read(_OFFSET.size))
+        fh.seek(table + (meta["pages"] + 1) * _OFFSET.size + start)
+        return meta, json.loads(fh.read(stop - start))
+
+
+# ---------- Cursors ----------
+
+def make_cursor(snapshot_id: str, meta: dict, page: int) -> Optional[str]:
+    """Opaque, signed cursor for ``page``; None once past the last page."""
+    if page >= meta["pages"]:
+        return None
+    return signing.dumps({"s": snapshot_id, "p": page}, salt=_CURSOR_SALT)
+
+
+def read_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        data = signing.loads(cursor, salt=_CURSOR_SALT)
+        return str(data["s"]), int(data["p"])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def page_payload(snapshot_id: str, meta: dict, page: int, rows: List[dict]) -> dict:
+    return {
+        "total": meta["total"],
+        "offset": page * meta["page_size"],
+        "tasks": rows,
+        "next_cursor": make_cursor(snapshot_id, meta, page + 1),
+    }
+
+
+def parse_page_size(value: Optional[str]) -> int:
+    """Parse ``?page_size=``; raises ValueError outside 1..MAX_PAGE_SIZE."""
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError("page_size must be an integer.")
+    if size < 1 or size > MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}.")
+    return size
@@ -1,8 +1,31 @@
+import asyncio
+import glob
+import gzip
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from unittest import mock
 from datetime import date, timedelta
 
-from django.test import SimpleTestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory, SimpleTestCase
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APIClient
 
+from . import snapshots
+from .dedupe import duplicate_pairs_naive, find_duplicates
+from .graphfile import TaskGraph, graph_stamp, load_tenant_graph, write_task_graph
+from .live import RankingHub, diff_rankings
+from .management.commands.loadtest import is_saturated
+from .queries import RankingIndex, RankingQuery
+from .scheduling import (
+    FairScheduler, RequestTooLarge, estimate_cost, percentile, request_tenant,
+)
 from .scoring import analyze_tasks, STRATEGIES, DEFAULT_STRATEGY
+from .snapshots import make_cursor, read_cursor
 
 
 class TaskScoringTests(SimpleTestCase):
@@ -180,3 +203,778 @@ class TaskScoringTests(SimpleTestCase):
                 ),
                 msg=f"Task {t['id']} should be flagged as circular.",
             )
+
+
+class AnalyzeResponseTests(SimpleTestCase):
+    """
+    HTTP-level tests for conditional requests, compression and
+    field selection on the analyze endpoint.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        patcher = mock.patch("tasks.snapshots.SNAPSHOT_DIR", tmpdir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        due = (date.today() + timedelta(days=2)).isoformat()
+        self.payload = {
+            "strategy": "smart_balance",
+            "tasks": [
+                {"id": "A", "title": "Task A", "due_date": due, "importance": 8},
+                {"id": "B", "title": "Task B", "estimated_hours": 2, "dependencies": ["A"]},
+            ],
+        }
+
+    def _post(self, query="", **headers):
+        return self.client.post(
+            f"/api/tasks/analyze/{query}", self.payload, format="json", headers=headers
+        )
+
+    def test_matching_if_none_match_returns_304(self):
+        first = self._post()
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        second = self._post(**{"If-None-Match": etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], etag)
+
+        # A different strategy is a different representation
+        self.payload["strategy"] = "fastest_wins"
+        third = self._post(**{"If-None-Match": etag})
+        self.assertEqual(third.status_code, 200)
+
+    def test_gzip_response_is_streamed_and_decodable(self):
+        plain = self._post()
+        compressed = self._post(**{"Accept-Encoding": "gzip"})
+
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertNotEqual(compressed["ETag"], plain["ETag"])
+        body = gzip.decompress(b"".join(compressed.streaming_content))
+        self.assertEqual(json.loads(body)["tasks"], plain.json()["tasks"])
+
+    def test_fields_parameter_limits_output_columns(self):
+        response = self._post("?fields=id,score,priority_label")
+        self.assertEqual(response.status_code, 200)
+        for task in response.json()["tasks"]:
+            self.assertEqual(set(task), {"id", "score", "priority_label"})
+
+        bad = self._post("?fields=id,nope")
+        self.assertEqual(bad.status_code, 400)
+
+    def test_due_date_is_scored(self):
+        # The serializer parses due_date into a date before scoring.
+        response = self._post()
+        task = next(t for t in response.json()["tasks"] if t["id"] == "A")
+        self.assertEqual(task["due_date"], self.payload["tasks"][0]["due_date"])
+        self.assertEqual(task["urgency_score"], 0.85)
+        self.assertIn("Task is due within 3 days.", task["reasons"])
+
+    def test_snapshot_pages_follow_cursor(self):
+        first = self._post("?snapshot=1&page_size=1")
+        self.assertEqual(first.status_code, 200)
+        data = first.json()
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(len(data["tasks"]), 1)
+
+        second = self.client.get(
+            "/api/tasks/analyze/pages/", {"cursor": data["next_cursor"]}
+        ).json()
+        self.assertEqual(second["offset"], 1)
+        self.assertIsNone(second["next_cursor"])
+
+        full = self._post().json()["tasks"]
+        self.assertEqual([data["tasks"][0]["id"], second["tasks"][0]["id"]],
+                         [t["id"] for t in full])
+
+        bad = self.client.get("/api/tasks/analyze/pages/", {"cursor": "forged"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_large_snapshot_keeps_every_page(self):
+        # More pages than a local-memory cache would hold (300 entries)
+        self.payload["tasks"] = [
+            {"id": f"T{i}", "title": f"Task {i}", "importance": i % 10 + 1}
+            for i in range(1000)
+        ]
+        data = self._post("?snapshot=1&page_size=2").json()
+        ids = [t["id"] for t in data["tasks"]]
+        cursor = data["next_cursor"]
+        for _ in range(3):
+            page = self.client.get("/api/tasks/analyze/pages/", {"cursor": cursor})
+            self.assertEqual(page.status_code, 200)
+            ids += [t["id"] for t in page.json()["tasks"]]
+            cursor = page.json()["next_cursor"]
+
+        full = self._post().json()["tasks"]
+        self.assertEqual(ids, [t["id"] for t in full[:8]])
+        last = self.client.get("/api/tasks/analyze/pages/",
+                               {"cursor": make_cursor(read_cursor(cursor)[0], {"pages": 500}, 499)})
+        self.assertEqual(last.json()["offset"], 998)
+        self.assertIsNone(last.json()["next_cursor"])
+
+    def test_expired_snapshot_returns_410(self):
+        cursor = self._post("?snapshot=1&page_size=1").json()["next_cursor"]
+        with mock.patch("tasks.snapshots.SNAPSHOT_TTL", -1):
+            page = self.client.get("/api/tasks/analyze/pages/", {"cursor": cursor})
+        self.assertEqual(page.status_code, 410)
+
+
+    def test_oldest_snapshot_is_evicted_beyond_size_limit(self):
+        first = self._post("?snapshot=1&page_size=1").json()["next_cursor"]
+        [path] = glob.glob(os.path.join(snapshots.SNAPSHOT_DIR, "*.snap"))
+        # Clearly older, whatever the file system's mtime resolution
+        os.utime(path, (time.time() - 5,) * 2)
+        self.payload["strategy"] = "fastest_wins"
+        with mock.patch("tasks.snapshots.MAX_TOTAL_BYTES", os.path.getsize(path) + 10):
+            second = self._post("?snapshot=1&page_size=1").json()["next_cursor"]
+            self.payload["tasks"] = self.payload["tasks"] * 50
+            too_large = self._post("?snapshot=1&page_size=1")
+
+        self.assertEqual(
+            self.client.get("/api/tasks/analyze/pages/", {"cursor": first}).status_code, 410
+        )
+        self.assertEqual(
+            self.client.get("/api/tasks/analyze/pages/", {"cursor": second}).status_code, 200
+        )
+        self.assertEqual(too_large.status_code, 413)
+
+    def test_snapshot_dir_writable_by_others_is_refused(self):
+        os.chmod(snapshots.SNAPSHOT_DIR, 0o777)
+        with self.assertRaises(ImproperlyConfigured):
+            snapshots.get_snapshot_meta("missing")
+
+class RankingStreamTests(SimpleTestCase):
+    """
+    Tests for ranking diffs and the server-sent-events hub.
+    """
+
+    def _tasks(self, today, importance_b=5):
+        return [
+            {"id": "A", "title": "Task A", "due_date": (today + timedelta(days=1)).isoformat(),
+             "estimated_hours": 2, "importance": 7},
+            {"id": "B", "title": "Task B", "due_date": (today + timedelta(days=20)).isoformat(),
+             "estimated_hours": 2, "importance": importance_b},
+        ]
+
+    def test_diff_reports_moves_labels_and_top3(self):
+        old = [{"id": "A", "priority_label": "High"}, {"id": "B", "priority_label": "Low"}]
+        new = [{"id": "B", "priority_label": "Medium"}, {"id": "A", "priority_label": "High"},
+               {"id": "C", "priority_label": "Low"}]
+
+        diff = diff_rankings(old, new)
+
+        # A stays in place relative to the others; only B moved.
+        self.assertEqual(diff["moved"], [{"id": "B", "from": 2, "to": 1}])
+        self.assertEqual(diff["labels"], [{"id": "B", "from": "Low", "to": "Medium"}])
+        self.assertEqual(diff["added"][0]["id"], "C")
+        self.assertEqual(diff["top3"], ["B", "A", "C"])
+        self.assertEqual(diff_rankings(new, new), {})
+
+    def test_diff_lists_relative_moves_only(self):
+        def ranking(ids):
+            return [{"id": tid, "priority_label": "Low"} for tid in ids]
+
+        def apply(ids, diff):
+            gone = set(diff.get("removed", [])) | {m["id"] for m in diff.get("moved", [])}
+            result = [tid for tid in ids if tid not in gone]
+            inserts = [(m["to"], m["id"]) for m in diff.get("moved", [])]
+            inserts += [(a["rank"], a["id"]) for a in diff.get("added", [])]
+            for rank, tid in sorted(inserts):
+                result.insert(rank - 1, tid)
+            return result
+
+        old_ids = [f"T{i}" for i in range(10_000)]
+        diff = diff_rankings(ranking(old_ids), ranking(["NEW"] + old_ids))
+        self.assertNotIn("moved", diff)
+        self.assertLess(len(json.dumps(diff)), 200)
+
+        rng = random.Random(5)
+        for _ in range(20):
+            new_ids = rng.sample(old_ids[:50], 45) + ["X", "Y"]
+            rng.shuffle(new_ids)
+            diff = diff_rankings(ranking(old_ids[:50]), ranking(new_ids))
+            self.assertEqual(apply(old_ids[:50], diff), new_ids)
+
+    def test_history_is_bounded_by_bytes(self):
+        today = date.today()
+        hub = RankingHub()
+        with mock.patch("tasks.live.HISTORY_BYTES", 800):
+            for i in range(10):
+                tasks = [{"id": f"{i}-{j}", "title": f"Task {j}"} for j in range(5)]
+                hub.update("acme", tasks, today=today)
+        state = hub._tenants["acme"]
+        self.assertLessEqual(state.history_bytes, 800)
+        self.assertEqual(state.history_bytes, sum(len(p) for _, _, p in state.history))
+        self.assertEqual([v for v, _, _ in state.history], [9, 10])
+        self.assertIsNone(hub.events_since("acme", 7))
+        self.assertEqual([v for v, _ in hub.events_since("acme", 8)], [9, 10])
+
+    def test_date_crossing_urgency_boundary_publishes_diff(self):
+        today = date.today()
+        hub = RankingHub()
+        hub.update("acme", self._tasks(today), today=today)
+
+        # Nothing changes before the next boundary (B enters the 14-day bucket)
+        self.assertEqual(hub.refresh("acme", today=today + timedelta(days=1)), {})
+        hub.refresh("acme", today=today + timedelta(days=6))
+        version, ranking = hub.ranking("acme")
+        b = next(t for t in ranking if t["id"] == "B")
+        self.assertEqual(b["urgency_score"], 0.5)
+
+    def test_tenant_put_keeps_due_dates_for_boundary_refresh(self):
+        today = date.today()
+        hub = RankingHub()
+        patcher = mock.patch("tasks.views.hub", hub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        client = APIClient()
+        response = client.put("/api/tasks/tenants/put-dates/tasks/",
+                              {"tasks": self._tasks(today)}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        ranking = client.get("/api/tasks/tenants/put-dates/tasks/").json()["tasks"]
+        self.assertEqual({t["id"]: t["due_date"] for t in ranking},
+                         {t["id"]: t["due_date"] for t in self._tasks(today)})
+        # The validated dates must also drive the urgency boundary refresh
+        hub.refresh("put-dates", today=today + timedelta(days=6))
+        _, ranking = hub.ranking("put-dates")
+        b = next(t for t in ranking if t["id"] == "B")
+        self.assertEqual(b["urgency_score"], 0.5)
+
+    async def test_subscriber_receives_snapshot_then_diff(self):
+        today = date.today()
+        hub = RankingHub()
+        hub.update("acme", self._tasks(today), today=today)
+
+        stream = hub.subscribe("acme")
+        self.assertTrue((await stream.__anext__()).startswith("retry:"))
+        snapshot = await stream.__anext__()
+        self.assertIn("event: snapshot", snapshot)
+
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        await asyncio.to_thread(hub.update, "acme", self._tasks(today, importance_b=10), today=today)
+        frame = await asyncio.wait_for(pending, 2)
+
+        self.assertIn("event: diff", frame)
+        payload = json.loads(frame.split("data: ", 1)[1])
+        self.assertEqual(payload["version"], 2)
+        await stream.aclose()
+
+    def test_reads_do_not_create_tenant_state(self):
+        hub = RankingHub()
+        self.assertEqual(hub.ranking("ghost"), (0, []))
+        self.assertEqual(hub.events_since("ghost", 0), [])
+        self.assertIsNone(hub.events_since("ghost", 3))
+        self.assertEqual(hub.query("ghost", RankingQuery()), (DEFAULT_STRATEGY, []))
+        self.assertEqual(hub.refresh("ghost"), {})
+        self.assertEqual(hub._tenants, {})
+
+    async def test_subscriber_sees_update_from_another_process(self):
+        # Two hubs stand in for two worker processes sharing TASKS_GRAPH_DIR.
+        today = date.today()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        writer, reader = RankingHub(), RankingHub()
+        with mock.patch("tasks.graphfile.GRAPH_DIR", tmpdir.name), \
+                mock.patch("tasks.live.POLL_SECONDS", 0.01):
+            stream = reader.subscribe("acme")
+            await stream.__anext__()
+            snapshot = await stream.__anext__()
+            self.assertIn('"ranking": []', snapshot)
+
+            pending = asyncio.ensure_future(stream.__anext__())
+            await asyncio.to_thread(writer.update, "acme", self._tasks(today), today=today)
+            frame = await asyncio.wait_for(pending, 2)
+            await stream.aclose()
+
+        self.assertIn("event: diff", frame)
+        (reader_version, reader_ranking), (writer_version, writer_ranking) = (
+            reader.ranking("acme"), writer.ranking("acme"))
+        self.assertEqual(reader_version, writer_version)
+        # Both hubs hold the shared mapping, not decoded copies of it.
+        self.assertIsInstance(reader_ranking, TaskGraph)
+        self.assertIsInstance(writer_ranking, TaskGraph)
+        self.assertEqual(list(reader_ranking), list(writer_ranking))
+
+
+    async def test_subscribers_share_one_poller_per_tenant(self):
+        today = date.today()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        writer, reader = RankingHub(), RankingHub()
+        loop_thread = threading.get_ident()
+        stat_threads = []
+
+        def stamp(path):
+            stat_threads.append(threading.get_ident())
+            return graph_stamp(path)
+
+        with mock.patch("tasks.graphfile.GRAPH_DIR", tmpdir.name), \
+                mock.patch("tasks.live.POLL_SECONDS", 0.01), \
+                mock.patch("tasks.live.graph_stamp", side_effect=stamp):
+            streams = [reader.subscribe("acme") for _ in range(3)]
+            for stream in streams:
+                await stream.__anext__()
+                await stream.__anext__()
+            self.assertEqual(len(reader._pollers), 1)
+
+            pending = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+            with mock.patch.object(reader, "_adopt", wraps=reader._adopt) as adopt:
+                await asyncio.to_thread(writer.update, "acme", self._tasks(today), today=today)
+                frames = await asyncio.wait_for(asyncio.gather(*pending), 2)
+            # Subscribers only wait; the poller alone adopts the new file.
+            self.assertEqual(adopt.call_count, 1)
+            for stream in streams:
+                await stream.aclose()
+
+        self.assertTrue(all("event: diff" in frame for frame in frames))
+        self.assertTrue(stat_threads)
+        self.assertNotIn(loop_thread, stat_threads)
+        self.assertEqual(reader._pollers, {})
+        self.assertEqual(reader._subscribers, {})
+        self.assertEqual(reader._waiters, {})
+
+    def test_writers_in_different_processes_keep_versions_in_step(self):
+        today = date.today()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        first, second = RankingHub(), RankingHub()
+        tasks = self._tasks(today)
+        with mock.patch("tasks.graphfile.GRAPH_DIR", tmpdir.name):
+            first.update("acme", tasks, today=today)
+            # `second` never synced: it still diffs against first's ranking
+            # and continues its version instead of starting over.
+            diff = second.update("acme", tasks[:1], today=today)
+            self.assertEqual((diff["removed"], diff["version"]), (["B"], 2))
+            self.assertEqual(load_tenant_graph("acme").meta["version"], 2)
+
+            first.sync("acme")
+            self.assertEqual(first.ranking("acme")[0], 2)
+            # A client of either worker can resume on the other.
+            self.assertEqual([v for v, _ in first.events_since("acme", 1)], [2])
+            self.assertEqual([v for v, _ in second.events_since("acme", 0)], [1, 2])
+
+            first.update("acme", tasks, today=today)
+            self.assertEqual(load_tenant_graph("acme").meta["version"], 3)
+            self.assertEqual(first.ranking("acme")[0], 3)
+
+
+class RankingQueryTests(SimpleTestCase):
+    """
+    Tests for the secondary indexes behind filtered ranking queries.
+    """
+
+    def _tasks(self, rng, n, today):
+        return [
+            {"id": f"T{i}", "title": f"Task {i}",
+             "due_date": rng.choice([None, (today + timedelta(days=rng.randint(-5, 40))).isoformat()]),
+             "estimated_hours": rng.choice([None, rng.randint(1, 16)]),
+             "importance": rng.choice([None, rng.randint(1, 10)]),
+             "dependencies": [f"T{rng.randrange(n)}" for _ in range(rng.randint(0, 2))]}
+            for i in range(n)
+        ]
+
+    def _brute_force(self, ranking, q):
+        blocks = {}
+        for t in ranking:
+            for dep in t["dependencies"]:
+                blocks[dep] = blocks.get(dep, 0) + 1
+
+        def keep(t):
+            due = date.fromisoformat(t["due_date"]) if t["due_date"] else None
+            if q.labels and t["priority_label"] not in q.labels:
+                return False
+            if (q.due_after or q.due_before) and due is None:
+                return False
+            if q.due_after and due < q.due_after or q.due_before and due > q.due_before:
+                return False
+            if q.min_importance is not None or q.max_importance is not None:
+                if t["importance"] is None:
+                    return False
+                if q.min_importance is not None and t["importance"] < q.min_importance:
+                    return False
+                if q.max_importance is not None and t["importance"] > q.max_importance:
+                    return False
+            count = blocks.get(t["id"], 0)
+            if q.min_blocks is not None and count < q.min_blocks:
+                return False
+            if q.max_blocks is not None and count > q.max_blocks:
+                return False
+            return True
+
+        return [t["id"] for t in ranking if keep(t)][:q.limit]
+
+    def _random_query(self, rng, today):
+        start = today + timedelta(days=rng.randint(-5, 40))
+        return RankingQuery(
+            labels=rng.choice([None, ["High"], ["Medium", "Low"]]),
+            due_after=rng.choice([None, start]),
+            due_before=rng.choice([None, start + timedelta(days=rng.randint(0, 10))]),
+            min_importance=rng.choice([None, rng.randint(1, 10)]),
+            max_importance=rng.choice([None, rng.randint(1, 10)]),
+            min_blocks=rng.choice([None, 0, 1, 2]),
+            max_blocks=rng.choice([None, 0, 3]),
+            limit=rng.choice([1, 5, 20]),
+        )
+
+    def test_queries_match_full_scan_across_updates(self):
+        rng = random.Random(7)
+        today = date(2025, 11, 20)
+        tasks = self._tasks(rng, 300, today)
+        ranking = analyze_tasks(tasks, today=today)
+        index = RankingIndex(ranking)
+
+        for step in range(4):
+            for _ in range(50):
+                q = self._random_query(rng, today)
+                self.assertEqual([t["id"] for t in index.query(q)],
+                                 self._brute_force(ranking, q), q)
+            # Alternate small edits (patched in place) and a bulk rebuild.
+            if step % 2 == 0:
+                tasks = tasks[:-3] + [dict(tasks[0], id="NEW", title="New task")]
+                tasks[5] = dict(tasks[5], importance=10)
+            else:
+                tasks = self._tasks(rng, 250, today)
+            ranking = analyze_tasks(tasks, today=today)
+            changed = index.update(ranking)
+            self.assertGreater(changed, 0)
+            self.assertEqual(len(index), len({t["id"] for t in ranking}))
+
+        self.assertEqual(index.update(ranking), 0)
+
+    def test_tied_scores_keep_ranking_order(self):
+        # Same score for every task; analyze_tasks keeps input order, which
+        # is not id order.
+        tasks = [{"id": tid, "title": tid, "importance": 5} for tid in ("C", "A", "B")]
+        ranking = analyze_tasks(tasks, today=date(2025, 11, 20))
+        index = RankingIndex(ranking)
+
+        self.assertEqual([t["id"] for t in ranking], ["C", "A", "B"])
+        self.assertEqual([t["id"] for t in index.query(RankingQuery())], ["C", "A", "B"])
+        self.assertEqual([t["id"] for t in index.query(RankingQuery(min_importance=5))],
+                         ["C", "A", "B"])
+
+    def test_tenant_query_endpoint(self):
+        today = date.today()
+        tasks = [
+            {"id": "A", "title": "Ship release", "due_date": today.isoformat(),
+             "estimated_hours": 2, "importance": 9},
+            {"id": "B", "title": "Write tests", "due_date": (today + timedelta(days=3)).isoformat(),
+             "estimated_hours": 3, "importance": 8, "dependencies": ["A"]},
+            {"id": "C", "title": "Plan Q3", "due_date": (today + timedelta(days=60)).isoformat(),
+             "estimated_hours": 8, "importance": 3, "dependencies": ["A", "B"]},
+        ]
+        patcher = mock.patch("tasks.views.hub", RankingHub())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        client = APIClient()
+        client.put("/api/tasks/tenants/query-test/tasks/", {"tasks": tasks}, format="json")
+
+        url = "/api/tasks/tenants/query-test/query/"
+        week = client.get(url, {"label": "High", "due_before": (today + timedelta(days=7)).isoformat()})
+        blocking = client.get(url, {"min_blocks": 1, "fields": "id"})
+        not_modified = client.get(url, {"min_blocks": 1, "fields": "id"},
+                                  HTTP_IF_NONE_MATCH=blocking["ETag"])
+        invalid = client.get(url, {"label": "Urgent"})
+
+        self.assertEqual(week.status_code, 200)
+        self.assertTrue(week.json()["tasks"])
+        for t in week.json()["tasks"]:
+            self.assertEqual(t["priority_label"], "High")
+        self.assertEqual(blocking.json()["tasks"], [{"id": "A"}, {"id": "B"}])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(invalid.status_code, 400)
+
+
+class DedupeTests(SimpleTestCase):
+    """
+    Tests for LSH duplicate detection and the dedupe stage.
+    """
+
+    def test_blocked_detection_matches_naive_pairs(self):
+        titles = [
+            "Fix login bug #1042",
+            "fix login bug #1042.",
+            "Fix loggin bug #1042",
+            "Write documentation for #77",
+            "Refactor payment module #5",
+            "Refactor payment modul #5",
+            "Unrelated task #9",
+        ]
+
+        groups = find_duplicates(titles)
+
+        self.assertEqual(groups, [[0, 1, 2], [4, 5]])
+        # Same pairs as the O(n²) reference on this small input
+        blocked = {(g[i], g[j]) for g in groups
+                   for i in range(len(g)) for j in range(i + 1, len(g))}
+        self.assertEqual(blocked, set(duplicate_pairs_naive(titles)))
+
+    def test_common_word_titles_keep_every_naive_pair(self):
+        # No unique suffix: every title shares most trigrams with its
+        # template siblings, which a rare-word blocking index cannot split.
+        rng = random.Random(3)
+        titles = []
+        for verb in ["Fix", "Add", "Update", "Remove", "Test"]:
+            for noun in ["login", "payment", "search", "export", "billing", "cache"]:
+                for customer in ["northwind", "contoso", "globex"]:
+                    title = f"{verb} {noun} integration tests for {customer}"
+                    titles.append(title)
+                    pos = rng.randrange(1, len(title) - 1)
+                    titles.append(title[:pos] + title[pos + 1:])
+        rng.shuffle(titles)
+
+        groups = find_duplicates(titles)
+
+        group_of = {idx: k for k, group in enumerate(groups) for idx in group}
+        pairs = duplicate_pairs_naive(titles)
+        self.assertGreater(len(pairs), 100)
+        for a, b in pairs:
+            self.assertEqual(group_of.get(a), group_of.get(b), (titles[a], titles[b]))
+            self.assertIn(a, group_of)
+
+    def test_merge_folds_duplicates_and_remaps_dependencies(self):
+        tasks = [
+            {"id": "A", "title": "Fix login bug", "estimated_hours": 2},
+            {"id": "A2", "title": "Fix login bug!", "importance": 9},
+            {"id": "B", "title": "Ship release", "dependencies": ["A", "A2"]},
+        ]
+
+        merged = analyze_tasks(tasks, dedupe="merge")
+        by_id = {t["id"]: t for t in merged}
+        self.assertNotIn("A2", by_id)
+        self.assertEqual(by_id["A"]["importance"], 9)
+        self.assertEqual(by_id["B"]["dependencies"], ["A"])
+        self.assertTrue(any("Merged 1 duplicate" in r for r in by_id["A"]["reasons"]))
+
+        flagged = analyze_tasks(tasks, dedupe="flag")
+        self.assertEqual(len(flagged), 3)
+        a2 = next(t for t in flagged if t["id"] == "A2")
+        self.assertIn("Possible duplicate of A.", a2["reasons"])
+
+        with self.assertRaises(ValueError):
+            analyze_tasks(tasks, dedupe="bogus")
+
+
+class TaskGraphFileTests(SimpleTestCase):
+    """
+    Tests for the memory-mapped task graph snapshot format.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        today = date.today()
+        self.ranking = analyze_tasks([
+            {"id": "A", "title": "Task A", "due_date": today.isoformat(),
+             "estimated_hours": 1.5, "importance": 9},
+            {"id": "B", "title": "Tâche B", "dependencies": ["A", "missing"]},
+            {"id": "C", "title": "Task C", "importance": 2, "dependencies": ["A"]},
+        ], today=today)
+
+    def test_round_trip_and_lookup(self):
+        path = os.path.join(self.tmpdir.name, "t.tgraph")
+        write_task_graph(path, self.ranking, {"strategy": "smart_balance"})
+
+        with TaskGraph(path) as graph:
+            self.assertEqual(len(graph), 3)
+            self.assertEqual(graph.rows(), self.ranking)
+            self.assertEqual(graph.meta["strategy"], "smart_balance")
+            self.assertEqual(list(graph.column("score")), [t["score"] for t in self.ranking])
+            for rank, task in enumerate(self.ranking):
+                self.assertEqual(graph.find(task["id"]), rank)
+            self.assertIsNone(graph.find("missing"))
+
+    def test_suggest_reads_tenant_graph(self):
+        with mock.patch("tasks.graphfile.GRAPH_DIR", self.tmpdir.name):
+            write_task_graph(os.path.join(self.tmpdir.name, "acme.tgraph"), self.ranking)
+            response = APIClient().get("/api/tasks/suggest/", {"tenant": "acme"})
+            missing = APIClient().get("/api/tasks/suggest/", {"tenant": "nobody"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t["id"] for t in response.json()["tasks"]],
+                         [t["id"] for t in self.ranking[:3]])
+        self.assertEqual(missing.status_code, 404)
+
+    def test_tenant_tasks_get_pages_through_graph(self):
+        tasks = [{"id": f"T{i}", "title": f"Task {i}", "importance": i % 10 + 1}
+                 for i in range(25)]
+        with mock.patch("tasks.graphfile.GRAPH_DIR", self.tmpdir.name), \
+                mock.patch("tasks.views.hub", RankingHub()):
+            client = APIClient()
+            client.put("/api/tasks/tenants/acme/tasks/", {"tasks": tasks}, format="json")
+            with mock.patch.object(TaskGraph, "row", autospec=True,
+                                   side_effect=TaskGraph.row) as row:
+                page = client.get("/api/tasks/tenants/acme/tasks/", {"offset": 20, "limit": 10})
+            bad = client.get("/api/tasks/tenants/acme/tasks/", {"limit": 5000})
+
+        ranking = analyze_tasks(tasks)
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(page.json()["total"], 25)
+        self.assertEqual([t["id"] for t in page.json()["tasks"]],
+                         [t["id"] for t in ranking[20:]])
+        # Only the five rows on the page were decoded.
+        self.assertEqual(row.call_count, 5)
+        self.assertEqual(bad.status_code, 400)
+
+    def test_refresh_rewrites_graph_when_only_scores_change(self):
+        today = date.today()
+        tasks = [
+            {"id": "A", "title": "Task A", "due_date": (today + timedelta(days=1)).isoformat(),
+             "estimated_hours": 2, "importance": 7},
+            {"id": "B", "title": "Task B", "due_date": (today + timedelta(days=20)).isoformat(),
+             "estimated_hours": 2, "importance": 2},
+        ]
+        hub = RankingHub()
+        with mock.patch("tasks.graphfile.GRAPH_DIR", self.tmpdir.name):
+            hub.update("acme", tasks, today=today)
+            diff = hub.refresh("acme", today=today + timedelta(days=6))
+            graph = TaskGraph(os.path.join(self.tmpdir.name, "acme.tgraph"))
+            self.addCleanup(graph.close)
+
+        self.assertEqual(diff, {})
+        _, ranking = hub.ranking("acme")
+        self.assertEqual(graph.rows(), list(ranking))
+        self.assertEqual(graph.row(graph.find("B"))["urgency_score"], 0.5)
+
+
+class LoadTestReportTests(SimpleTestCase):
+    """
+    Tests for the load-test report helpers.
+    """
+
+    def test_percentiles_use_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_saturation_criteria(self):
+        step = {"sent_rps": 100, "achieved_rps": 98, "error_rate": 0.0,
+                "latency_ms": {"p99": 200}}
+        self.assertFalse(is_saturated(step, max_error_rate=0.01, slo_p99_ms=500))
+        self.assertTrue(is_saturated(dict(step, achieved_rps=60), 0.01, 500))
+        self.assertTrue(is_saturated(dict(step, error_rate=0.05), 0.01, 500))
+        self.assertTrue(is_saturated(dict(step, latency_ms={"p99": 900}), 0.01, 500))
+
+
+class FairSchedulerTests(SimpleTestCase):
+    """
+    Tests for cost estimation, fair queuing and admission control.
+    """
+
+    def _scheduler(self, **kwargs):
+        options = dict(slots=1, fast_lane_slots=0, fast_lane_max_cost=0,
+                       max_request_cost=1000, queue_cost_budget=1000, max_wait=5)
+        options.update(kwargs)
+        return FairScheduler(**options)
+
+    def _wait_for_queue(self, scheduler, depth):
+        deadline = time.monotonic() + 2
+        while scheduler.metrics()["queue_depth"] < depth:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.001)
+
+    def test_tenant_header_requires_trusted_proxy(self):
+        request = RequestFactory().post("/", HTTP_X_TENANT_ID="acme", REMOTE_ADDR="10.0.0.7")
+        self.assertEqual(request_tenant(request), "ip:10.0.0.7")
+        with mock.patch("tasks.scheduling.TRUST_TENANT_HEADER", True):
+            self.assertEqual(request_tenant(request), "acme")
+
+    def test_tenant_put_is_scheduled_by_caller_not_slug(self):
+        scheduler = self._scheduler(max_request_cost=10_000, queue_cost_budget=10_000)
+        client = APIClient()
+        with mock.patch("tasks.views.scheduler", scheduler), \
+                mock.patch("tasks.views.hub", RankingHub()):
+            for slug in ("a", "b", "c"):
+                response = client.put(f"/api/tasks/tenants/{slug}/tasks/",
+                                      {"tasks": [{"id": "A", "title": "A"}]}, format="json")
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(scheduler.metrics()["tenants"]), ["ip:127.0.0.1"])
+
+    def test_query_rescore_for_another_strategy_is_admitted(self):
+        tasks = [{"id": f"T{i}", "title": f"Task {i}", "dependencies": [f"T{i - 1}"] if i else []}
+                 for i in range(6)]   # estimated cost: 6 tasks + 5 edges
+        hub = RankingHub()
+        hub.update("acme", tasks)
+        client = APIClient()
+        url = "/api/tasks/tenants/acme/query/"
+        with mock.patch("tasks.views.hub", hub):
+            with mock.patch("tasks.views.scheduler", self._scheduler(max_request_cost=10)):
+                # The index for the scored strategy is current: nothing to admit.
+                self.assertEqual(client.get(url).status_code, 200)
+                too_large = client.get(url, {"strategy": "fastest_wins"})
+            scheduler = self._scheduler()
+            with mock.patch("tasks.views.scheduler", scheduler), \
+                    mock.patch.object(scheduler, "admit", wraps=scheduler.admit) as admit:
+                response = client.get(url, {"strategy": "fastest_wins"})
+                client.get(url, {"strategy": "fastest_wins"})
+
+        self.assertEqual(too_large.status_code, 413)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["tasks"]), 6)
+        # Only the query that rescored was admitted.
+        admit.assert_called_once_with("ip:127.0.0.1", 11)
+
+    def test_idle_tenant_stats_are_bounded(self):
+        scheduler = self._scheduler(max_tracked_tenants=3, fast_lane_slots=1,
+                                    fast_lane_max_cost=10)
+        with scheduler.admit("busy", 100):
+            for i in range(10):
+                with scheduler.admit(f"t{i}", 1):
+                    pass
+            tenants = scheduler.metrics()["tenants"]
+        self.assertEqual(len(tenants), 3)
+        self.assertIn("busy", tenants)
+        self.assertIn("t9", tenants)
+
+    def test_estimate_counts_tasks_and_edges(self):
+        tasks = [{"dependencies": ["a", "b"]}, {"dependencies": None}, "junk"]
+        self.assertEqual(estimate_cost(tasks), 5)
+        self.assertEqual(estimate_cost("not a list"), 0)
+        with mock.patch("tasks.scheduling.DEDUPE_COST_PER_TASK", 10):
+            self.assertEqual(estimate_cost(tasks, dedupe="flag"), 35)
+
+    def test_small_tenant_is_not_starved_by_large_backlog(self):
+        scheduler = self._scheduler()
+        order = []
+
+        def run(tenant, name):
+            with scheduler.admit(tenant, 100):
+                order.append(name)
+
+        blocker = scheduler.admit("big", 10)
+        blocker.__enter__()
+        threads = []
+        for i, (tenant, name) in enumerate(
+            [("big", "big1"), ("big", "big2"), ("big", "big3"), ("small", "small1")]
+        ):
+            thread = threading.Thread(target=run, args=(tenant, name))
+            thread.start()
+            threads.append(thread)
+            self._wait_for_queue(scheduler, i + 1)
+        blocker.__exit__(None, None, None)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ["big1", "small1", "big2", "big3"])
+
+    def test_over_budget_work_is_rejected(self):
+        scheduler = self._scheduler(queue_cost_budget=150, fast_lane_slots=1,
+                                    fast_lane_max_cost=10)
+        with self.assertRaises(RequestTooLarge):
+            with scheduler.admit("t", 5000):
+                pass
+
+        with scheduler.admit("t", 100):
+            # The fast lane still admits small work while the slot is busy
+            with scheduler.admit("other", 5):
+                pass
+            with self.assertRaises(Throttled) as ctx:
+                with scheduler.admit("t", 100):
+                    pass
+        self.assertGreaterEqual(ctx.exception.wait, 1)
+        self.assertEqual(scheduler.metrics()["tenants"]["t"]["rejected"], 2)
@@ -1,7 +1,20 @@
 from django.urls import path
-from .views import AnalyzeTasksView, SuggestTasksView
+from .views import (
+    AnalyzeTasksView,
+    AnalyzePageView,
+    SchedulerMetricsView,
+    SuggestTasksView,
+    TenantQueryView,
+    TenantTasksView,
+    tenant_ranking_stream,
+)
 
 urlpatterns = [
     path("tasks/analyze/", AnalyzeTasksView.as_view(), name="tasks-analyze"),
+    path("tasks/analyze/pages/", AnalyzePageView.as_view(), name="tasks-analyze-page"),
     path("tasks/suggest/", SuggestTasksView.as_view(), name="tasks-suggest"),
+    path("tasks/scheduler/", SchedulerMetricsView.as_view(), name="tasks-scheduler"),
+    path("tasks/tenants/<slug:tenant>/tasks/", TenantTasksView.as_view(), name="tasks-tenant"),
+    path("tasks/tenants/<slug:tenant>/query/", TenantQueryView.as_view(), name="tasks-tenant-query"),
+    path("tasks/tenants/<slug:tenant>/stream/", tenant_ranking_stream, name="tasks-tenant-stream"),
 ]
@@ -1,51 +1,227 @@
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from .serializers import TaskInputSerializer, TaskOutputSerializer
+from datetime import date
+
+from .serializers import (
+    RankingQuerySerializer,
+    TaskInputSerializer,
+    TaskOutputSerializer,
+    TenantTasksPageSerializer,
+)
 from .scoring import analyze_tasks, DEFAULT_STRATEGY, STRATEGIES
+from .dedupe import DEDUPE_MODES
+from .responses import (
+    compute_etag,
+    etag_matches,
+    json_response,
+    negotiate_encoding,
+    not_modified_response,
+    parse_fields,
+    representation_etag,
+)
+from .graphfile import load_tenant_graph
+from .live import hub
+from .queries import RankingQuery
+from .scheduling import estimate_cost, request_tenant, scheduler
+from .snapshots import (
+    InvalidCursor,
+    SnapshotExpired,
+    SnapshotTooLarge,
+    get_snapshot_meta,
+    load_page,
+    page_payload,
+    parse_page_size,
+    read_cursor,
+    store_snapshot,
+)
+
+
+def _requested_fields(request):
+    """Parse ``?fields=`` against the output schema; raises ValueError."""
+    return parse_fields(
+        request.query_params.get("fields"), TaskOutputSerializer().fields.keys()
+    )
 
 
 class AnalyzeTasksView(APIView):
     """
-    POST /api/tasks/analyze/
+    POST /api/tasks/analyze/?fields=id,score,priority_label
+    POST /api/tasks/analyze/?snapshot=1&page_size=100
 
     Body:
     {
       "tasks": [ ... ],
-      "strategy": "smart_balance"
+      "strategy": "smart_balance",
+      "dedupe": "flag" | "merge"   (optional)
     }
+
+    Scoring runs through the per-tenant fair scheduler: oversized lists
+    get 413, and work beyond the queue budget gets 429 with Retry-After.
+
+    Responses carry a strong ETag derived from the validated input, the
+    strategy and today's date; a matching If-None-Match returns 304
+    without scoring. Bodies are gzip/brotli compressed when accepted.
+
+    With ``snapshot=1`` the ranking is cached server-side and only the
+    first page is returned, together with a ``next_cursor`` for
+    AnalyzePageView.
     """
 
     def post(self, request, *args, **kwargs):
         tasks_data = request.data.get("tasks", [])
         strategy = request.data.get("strategy", DEFAULT_STRATEGY)
+        dedupe = request.data.get("dedupe") or None
+        use_snapshot = request.query_params.get("snapshot") in ("1", "true")
+
+        if dedupe is not None and dedupe not in DEDUPE_MODES:
+            return Response(
+                {"dedupe": [f"Must be one of: {', '.join(DEDUPE_MODES)}."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            fields = _requested_fields(request)
+        except ValueError as exc:
+            return Response({"fields": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        page_size = None
+        if use_snapshot:
+            try:
+                page_size = parse_page_size(request.query_params.get("page_size"))
+            except ValueError as exc:
+                return Response({"page_size": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Admission happens before validation, which is itself O(n).
+        with scheduler.admit(request_tenant(request), estimate_cost(tasks_data, dedupe)):
+            return self._analyze(
+                request, tasks_data, strategy, dedupe, fields, use_snapshot, page_size
+            )
 
+    def _analyze(self, request, tasks_data, strategy, dedupe, fields, use_snapshot,
+                 page_size):
         input_serializer = TaskInputSerializer(data=tasks_data, many=True)
         if not input_serializer.is_valid():
             return Response(input_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        enriched = analyze_tasks(input_serializer.validated_data, strategy_name=strategy)
-        output_serializer = TaskOutputSerializer(enriched, many=True)
+        encoding = negotiate_encoding(request)
+        digest = compute_etag(
+            input_serializer.validated_data, strategy, dedupe, fields, date.today(),
+            page_size,
+        )
+        etag = representation_etag(digest, encoding)
 
-        return Response({
+        if use_snapshot:
+            return self._snapshot_response(
+                request, input_serializer.validated_data, strategy, dedupe, fields,
+                digest.strip('"'), page_size, etag, encoding,
+            )
+
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        enriched = analyze_tasks(
+            input_serializer.validated_data, strategy_name=strategy, dedupe=dedupe
+        )
+        output_serializer = TaskOutputSerializer(enriched, many=True, fields=fields)
+
+        return json_response({
             "strategy": strategy,
             "strategies_available": list(STRATEGIES.keys()),
             "tasks": output_serializer.data,
-        }, status=status.HTTP_200_OK)
+        }, etag, encoding)
+
+    def _snapshot_response(self, request, tasks, strategy, dedupe, fields,
+                           snapshot_id, page_size, etag, encoding):
+        # The snapshot ID is the input digest, so identical requests reuse
+        # a live snapshot instead of scoring again.
+        meta = get_snapshot_meta(snapshot_id)
+        if meta is not None and etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        rows = None
+        if meta is not None:
+            try:
+                meta, rows = load_page(snapshot_id, 0)
+            except SnapshotExpired:
+                rows = None
+        if rows is None:
+            enriched = analyze_tasks(tasks, strategy_name=strategy, dedupe=dedupe)
+            ranked = TaskOutputSerializer(enriched, many=True, fields=fields).data
+            try:
+                meta = store_snapshot(snapshot_id, list(ranked), page_size)
+            except SnapshotTooLarge:
+                return Response(
+                    {"detail": "Ranking is too large to snapshot; request it without snapshot=1."},
+                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+            rows = ranked[:page_size]
+
+        return json_response({
+            "strategy": strategy,
+            "strategies_available": list(STRATEGIES.keys()),
+            **page_payload(snapshot_id, meta, 0, rows),
+        }, etag, encoding)
+
+
+class AnalyzePageView(APIView):
+    """
+    GET /api/tasks/analyze/pages/?cursor=<next_cursor>
+
+    Serves one page of a ranking snapshot created by AnalyzeTasksView.
+    Returns 410 once the snapshot has expired; re-run the analysis then.
+    """
+
+    def get(self, request, *args, **kwargs):
+        cursor = request.query_params.get("cursor", "")
+        try:
+            snapshot_id, page = read_cursor(cursor)
+        except InvalidCursor:
+            return Response({"cursor": ["Invalid cursor."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Pages of a snapshot never change, so the cursor identifies the body.
+        encoding = negotiate_encoding(request)
+        etag = representation_etag(compute_etag(snapshot_id, page), encoding)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        try:
+            meta, rows = load_page(snapshot_id, page)
+        except SnapshotExpired:
+            return Response(
+                {"detail": "Snapshot expired; run the analysis again."},
+                status=status.HTTP_410_GONE,
+            )
+
+        return json_response(page_payload(snapshot_id, meta, page, rows), etag, encoding)
 
 
 class SuggestTasksView(APIView):
     """
-    GET /api/tasks/suggest/?strategy=smart_balance
+    GET /api/tasks/suggest/?strategy=smart_balance&fields=id,score
+    GET /api/tasks/suggest/?tenant=acme
 
     For the assignment I keep this simple and use a sample set.
     In a real app this would use stored user tasks.
+
+    With ``tenant`` (and TASKS_GRAPH_DIR configured) the top 3 are read
+    from the tenant's memory-mapped task graph instead.
     """
 
     def get(self, request, *args, **kwargs):
         strategy = request.query_params.get("strategy", DEFAULT_STRATEGY)
 
+        try:
+            fields = _requested_fields(request)
+        except ValueError as exc:
+            return Response({"fields": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        tenant = request.query_params.get("tenant")
+        if tenant:
+            return self._tenant_response(request, tenant, fields)
+
         # Demo tasks - to keep focus on algorithm, not persistence
         sample_tasks = [
             {
@@ -74,12 +250,186 @@ class SuggestTasksView(APIView):
             },
         ]
 
+        encoding = negotiate_encoding(request)
+        etag = representation_etag(
+            compute_etag(sample_tasks, strategy, fields, date.today()), encoding
+        )
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
         enriched = analyze_tasks(sample_tasks, strategy_name=strategy)
         top3 = enriched[:3]
 
-        output_serializer = TaskOutputSerializer(top3, many=True)
-        return Response({
+        output_serializer = TaskOutputSerializer(top3, many=True, fields=fields)
+        return json_response({
             "strategy": strategy,
             "tasks": output_serializer.data,
             "note": "For the assignment this uses demo tasks; in a real system this would use user-specific stored tasks."
+        }, etag, encoding)
+
+    def _tenant_response(self, request, tenant, fields):
+        try:
+            graph = load_tenant_graph(tenant)
+        except ValueError as exc:
+            return Response({"tenant": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+        if graph is None:
+            return Response(
+                {"detail": "No stored ranking for this tenant."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        encoding = negotiate_encoding(request)
+        etag = representation_etag(compute_etag(tenant, graph.stamp, fields), encoding)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        output_serializer = TaskOutputSerializer(graph.top(3), many=True, fields=fields)
+        return json_response({
+            "strategy": graph.meta.get("strategy"),
+            "tasks": output_serializer.data,
+        }, etag, encoding)
+
+
+class TenantTasksView(APIView):
+    """
+    GET /api/tasks/tenants/<tenant>/tasks/?offset=0&limit=100
+    PUT /api/tasks/tenants/<tenant>/tasks/
+
+    Body (PUT):
+    {
+      "tasks": [ ... ],
+      "strategy": "smart_balance"
+    }
+
+    GET returns one page of the tenant's ranking (``limit`` at most 1000).
+    PUT replaces the tenant's task list, rescores it and pushes the
+    ranking diff to subscribers of the tenant's event stream.
+    """
+
+    def get(self, request, tenant, *args, **kwargs):
+        params = TenantTasksPageSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        offset, limit = params.validated_data["offset"], params.validated_data["limit"]
+
+        # Prefer the shared task graph: it is up to date in every worker,
+        # while the hub only knows updates this process received. Only the
+        # requested rows are decoded from the mapping.
+        graph = load_tenant_graph(tenant)
+        if graph is not None:
+            version, total = graph.meta.get("version", 0), len(graph)
+            rows = graph.rows(offset, offset + limit)
+        else:
+            version, ranking = hub.ranking(tenant)
+            total, rows = len(ranking), ranking[offset:offset + limit]
+        output_serializer = TaskOutputSerializer(rows, many=True)
+        return Response({
+            "version": version,
+            "total": total,
+            "offset": offset,
+            "tasks": output_serializer.data,
+        }, status=status.HTTP_200_OK)
+
+    def put(self, request, tenant, *args, **kwargs):
+        tasks_data = request.data.get("tasks", [])
+        strategy = request.data.get("strategy", DEFAULT_STRATEGY)
+
+        # Fair share follows the caller, not the unauthenticated URL slug.
+        with scheduler.admit(request_tenant(request), estimate_cost(tasks_data)):
+            input_serializer = TaskInputSerializer(data=tasks_data, many=True)
+            if not input_serializer.is_valid():
+                return Response(input_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            diff = hub.update(tenant, input_serializer.validated_data, strategy=strategy)
+        version, _ = hub.ranking(tenant)
+        return Response({
+            "strategy": strategy,
+            "version": version,
+            "changes": diff,
         }, status=status.HTTP_200_OK)
+
+
+class TenantQueryView(APIView):
+    """
+    GET /api/tasks/tenants/<tenant>/query/?label=High&due_before=2025-12-07
+    GET /api/tasks/tenants/<tenant>/query/?min_blocks=1&limit=20
+
+    Filtered top-N over the tenant's ranking, served from sorted indexes
+    built when the tasks are scored. Filters: ``label`` (repeatable),
+    ``due_after``/``due_before`` (inclusive), ``min_importance``/
+    ``max_importance``, ``min_blocks``/``max_blocks`` (number of tasks
+    depending on a task) and ``strategy``. Rows keep rank order.
+    """
+
+    def get(self, request, tenant, *args, **kwargs):
+        params = RankingQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fields = _requested_fields(request)
+        except ValueError as exc:
+            return Response({"fields": [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = params.validated_data
+        query = RankingQuery(
+            labels=data.get("label"),
+            due_after=data.get("due_after"),
+            due_before=data.get("due_before"),
+            min_importance=data.get("min_importance"),
+            max_importance=data.get("max_importance"),
+            min_blocks=data.get("min_blocks"),
+            max_blocks=data.get("max_blocks"),
+            limit=data["limit"],
+        )
+        # Rescoring for another strategy is scoring work like any other.
+        strategy, rows = hub.query(
+            tenant, query, strategy=data.get("strategy"),
+            admit=lambda cost: scheduler.admit(request_tenant(request), cost),
+        )
+        tasks = TaskOutputSerializer(rows, many=True, fields=fields).data
+
+        # The result is only k rows, so hashing it is cheaper than
+        # tracking per-worker index revisions.
+        encoding = negotiate_encoding(request)
+        etag = representation_etag(compute_etag(strategy, tasks), encoding)
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        return json_response({
+            "strategy": strategy,
+            "tasks": tasks,
+        }, etag, encoding)
+
+
+class SchedulerMetricsView(APIView):
+    """
+    GET /api/tasks/scheduler/
+
+    Queue depth, running work, wait-time percentiles and per-tenant
+    counters of the scoring scheduler in this process.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return Response(scheduler.metrics(), status=status.HTTP_200_OK)
+
+
+async def tenant_ranking_stream(request, tenant):
+    """
+    GET /api/tasks/tenants/<tenant>/stream/
+
+    Server-sent events: a ``snapshot`` of the ranking, then a ``diff``
+    event whenever ranks, priority labels or the top 3 change. Clients
+    resume with the standard Last-Event-ID header. Requires an ASGI
+    server (see task_analyzer/asgi.py).
+    """
+    last_event_id = request.headers.get("Last-Event-ID")
+    try:
+        last_version = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_version = None
+
+    response = StreamingHttpResponse(
+        hub.subscribe(tenant, last_version), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop reverse proxies from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,9 +1,26 @@
 // === CONFIG ===
 const API_BASE_URL = "http://127.0.0.1:8000/api";
 
+// Analysis results are fetched as pages of a server-side snapshot
+const ANALYZE_PAGE_SIZE = 200;
+// Rows rendered above/below the visible window
+const VIRTUAL_OVERSCAN = 10;
+// The SVG graph is only readable for a handful of nodes
+const GRAPH_MAX_NODES = 60;
+
 // We keep current tasks in memory (what you add via form / JSON)
 let currentTasks = [];
 
+// Analyzed rows loaded so far; only the visible window is in the DOM
+let analysisState = {
+  rows: [],
+  total: 0,
+  nextCursor: null,
+  loading: false,
+};
+let analysisRowHeight = 34;
+let analysisRenderQueued = false;
+
 // Utility: create element with classes
 function el(tag, className, text) {
   const node = document.createElement(tag);
@@ -34,6 +51,7 @@ const suggestBtn = document.getElementById("suggest-btn");
 
 const statusBar = document.getElementById("status-bar");
 const analysisBody = document.getElementById("analysis-body");
+const analysisScroll = document.getElementById("analysis-scroll");
 const analysisSubtitle = document.getElementById("analysis-subtitle");
 const activeStrategyPill = document.getElementById("active-strategy-pill");
 
@@ -130,66 +148,168 @@ function priorityPill(label) {
 
 // === RENDER ANALYSIS TABLE ===
 
-function renderAnalysis(tasks, strategyName, sourceLabel) {
+function buildAnalysisRow(task, index) {
+  const row = el("tr");
+
+  const rankCell = el("td", null, String(index + 1));
+  const taskCell = el("td");
+  const scoreCell = el("td");
+  const priorityCell = el("td");
+  const dueCell = el("td");
+  const hoursCell = el("td");
+  const impCell = el("td");
+  const whyCell = el("td");
+
+  taskCell.textContent = task.title || task.id || "Untitled task";
+
+  scoreCell.textContent =
+    typeof task.score === "number" ? task.score.toFixed(3) : "–";
+
+  const label = task.priority_label || "Low";
+  priorityCell.innerHTML = priorityPill(label);
+
+  dueCell.textContent = task.due_date || "–";
+  hoursCell.textContent =
+    task.estimated_hours === null || task.estimated_hours === undefined
+      ? "–"
+      : String(task.estimated_hours);
+  impCell.textContent =
+    task.importance === null || task.importance === undefined
+      ? "–"
+      : String(task.importance);
+
+  const reasons = Array.isArray(task.reasons) ? task.reasons : [];
+  whyCell.textContent =
+    reasons.length > 0 ? reasons.join(" • ") : "No explanation available.";
+  // Rows are single-line so they stay a fixed height; full text on hover
+  whyCell.title = whyCell.textContent;
+
+  row.appendChild(rankCell);
+  row.appendChild(taskCell);
+  row.appendChild(scoreCell);
+  row.appendChild(priorityCell);
+  row.appendChild(dueCell);
+  row.appendChild(hoursCell);
+  row.appendChild(impCell);
+  row.appendChild(whyCell);
+
+  return row;
+}
+
+function spacerRow(height) {
+  const row = el("tr", "virtual-spacer");
+  const cell = el("td");
+  cell.colSpan = 8;
+  cell.style.height = `${height}px`;
+  row.appendChild(cell);
+  return row;
+}
+
+// Render only the rows intersecting the scroll viewport, padded with
+// spacer rows so the scrollbar still reflects the full ranking.
+function renderAnalysisWindow() {
+  analysisRenderQueued = false;
+  const { rows, total } = analysisState;
+
+  const viewport = analysisScroll.clientHeight || 260;
+  const first = Math.max(
+    0,
+    Math.floor(analysisScroll.scrollTop / analysisRowHeight) - VIRTUAL_OVERSCAN
+  );
+  const visible = Math.ceil(viewport / analysisRowHeight) + 2 * VIRTUAL_OVERSCAN;
+  const last = Math.min(rows.length, first + visible);
+
+  const fragment = document.createDocumentFragment();
+  if (first > 0) fragment.appendChild(spacerRow(first * analysisRowHeight));
+  for (let i = first; i < last; i += 1) {
+    fragment.appendChild(buildAnalysisRow(rows[i], i));
+  }
+  if (total > last) {
+    fragment.appendChild(spacerRow((total - last) * analysisRowHeight));
+  }
+
   analysisBody.innerHTML = "";
+  analysisBody.appendChild(fragment);
+
+  // Calibrate against the real rendered height once rows exist
+  const sample = analysisBody.querySelector("tr:not(.virtual-spacer)");
+  if (sample && sample.offsetHeight && sample.offsetHeight !== analysisRowHeight) {
+    analysisRowHeight = sample.offsetHeight;
+    scheduleAnalysisRender();
+    return;
+  }
+
+  // Fetch the next page when the window reaches unloaded rows
+  if (first + visible >= rows.length && analysisState.nextCursor) {
+    loadNextAnalysisPage();
+  }
+}
+
+function scheduleAnalysisRender() {
+  if (analysisRenderQueued) return;
+  analysisRenderQueued = true;
+  window.requestAnimationFrame(renderAnalysisWindow);
+}
+
+function renderAnalysis(tasks, strategyName, sourceLabel, paging = {}) {
+  analysisBody.innerHTML = "";
+  analysisScroll.scrollTop = 0;
 
   if (!tasks || !tasks.length) {
+    analysisState = { rows: [], total: 0, nextCursor: null, loading: false };
     analysisSubtitle.textContent = "No analyzed tasks to display yet.";
     activeStrategyPill.textContent = "Strategy: –";
     return;
   }
 
+  analysisState = {
+    rows: tasks.slice(),
+    total: paging.total || tasks.length,
+    nextCursor: paging.nextCursor || null,
+    loading: false,
+  };
+
   analysisSubtitle.textContent =
     sourceLabel || "Sorted by descending priority score.";
   activeStrategyPill.textContent = `Strategy: ${strategyName}`;
 
-  tasks.forEach((task, index) => {
-    const row = el("tr");
-
-    const rankCell = el("td", null, String(index + 1));
-    const taskCell = el("td");
-    const scoreCell = el("td");
-    const priorityCell = el("td");
-    const dueCell = el("td");
-    const hoursCell = el("td");
-    const impCell = el("td");
-    const whyCell = el("td");
-
-    taskCell.textContent = task.title || task.id || "Untitled task";
-
-    scoreCell.textContent =
-      typeof task.score === "number" ? task.score.toFixed(3) : "–";
-
-    const label = task.priority_label || "Low";
-    priorityCell.innerHTML = priorityPill(label);
-
-    dueCell.textContent = task.due_date || "–";
-    hoursCell.textContent =
-      task.estimated_hours === null || task.estimated_hours === undefined
-        ? "–"
-        : String(task.estimated_hours);
-    impCell.textContent =
-      task.importance === null || task.importance === undefined
-        ? "–"
-        : String(task.importance);
-
-    const reasons = Array.isArray(task.reasons) ? task.reasons : [];
-    whyCell.textContent =
-      reasons.length > 0 ? reasons.join(" • ") : "No explanation available.";
+  renderAnalysisWindow();
+}
 
-    row.appendChild(rankCell);
-    row.appendChild(taskCell);
-    row.appendChild(scoreCell);
-    row.appendChild(priorityCell);
-    row.appendChild(dueCell);
-    row.appendChild(hoursCell);
-    row.appendChild(impCell);
-    row.appendChild(whyCell);
+async function loadNextAnalysisPage() {
+  if (analysisState.loading || !analysisState.nextCursor) return;
+  const state = analysisState;
+  state.loading = true;
 
-    analysisBody.appendChild(row);
-  });
+  try {
+    const params = new URLSearchParams({ cursor: state.nextCursor });
+    const response = await fetch(`${API_BASE_URL}/tasks/analyze/pages/?${params}`);
+    if (response.status === 410) {
+      state.nextCursor = null;
+      setStatus("Ranking snapshot expired. Run the analysis again.", true);
+      return;
+    }
+    if (!response.ok) {
+      throw new Error(`Server returned ${response.status}`);
+    }
+    const data = await response.json();
+    // Ignore pages that arrive after a newer analysis replaced the state
+    if (state !== analysisState) return;
+    state.rows.push(...(data.tasks || []));
+    state.nextCursor = data.next_cursor || null;
+    scheduleAnalysisRender();
+  } catch (err) {
+    console.error(err);
+    setStatus("Failed to load more results. Check console for details.", true);
+  } finally {
+    state.loading = false;
+  }
 }
 
+analysisScroll.addEventListener("scroll", scheduleAnalysisRender, {
+  passive: true,
+});
+
 // === DEPENDENCY GRAPH RENDERING ===
 
 function clearGraph() {
@@ -213,6 +333,9 @@ function renderDependencyGraph(tasks) {
   const centerY = height / 2;
   const radius = Math.min(width, height) / 2.6;
 
+  // Keep the graph legible for large rankings: only the top tasks
+  tasks = tasks.slice(0, GRAPH_MAX_NODES);
+
   const positions = {};
   const n = tasks.length;
 
@@ -392,7 +515,7 @@ addTaskBtn.addEventListener("click", () => {
 clearTasksBtn.addEventListener("click", () => {
   currentTasks = [];
   renderTaskList();
-  analysisBody.innerHTML = "";
+  renderAnalysis([], null);
   clearGraph();
   graphEmptyState.style.display = "flex";
   setStatus("All tasks cleared.");
@@ -468,7 +591,11 @@ analyzeBtn.addEventListener("click", async () => {
       tasks: currentTasks,
     };
 
-    const response = await fetch(`${API_BASE_URL}/tasks/analyze/`, {
+    const params = new URLSearchParams({
+      snapshot: "1",
+      page_size: String(ANALYZE_PAGE_SIZE),
+    });
+    const response = await fetch(`${API_BASE_URL}/tasks/analyze/?${params}`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -482,7 +609,10 @@ analyzeBtn.addEventListener("click", async () => {
 
     const data = await response.json();
     const tasks = data.tasks || data || [];
-    renderAnalysis(tasks, data.strategy || strategy, "Sorted by priority score.");
+    renderAnalysis(tasks, data.strategy || strategy, "Sorted by priority score.", {
+      total: data.total,
+      nextCursor: data.next_cursor,
+    });
     renderDependencyGraph(tasks);
     setStatus("Analysis complete. Tasks are sorted by priority.");
   } catch (err) {